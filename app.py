@@ -3,248 +3,63 @@ Pawdcast Skit Factory — Enhanced Modern Design
 Audio Mode: Perfect sync with Google TTS / any audio
 """
 import streamlit as st
-import google.generativeai as genai
+import numpy as np
 import os
 import re
+import json
+import time
+import math
+import functools
+import contextlib
+import contextvars
+import collections
+import itertools
+import bisect
+import random
+import hashlib
+import hmac
+import secrets
+import threading
+import shutil
+import unicodedata
 import subprocess
-import tempfile
 import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
 from pathlib import Path
 import base64
 import traceback
+# google-genai (and the httpx client under it) is imported where it is used:
+# it is about half of this module's import time and Audio Mode never needs it
 
 # ============================================================================
 # PAGE CONFIG & MODERN CSS
 # ============================================================================
-st.set_page_config(page_title="Pawdcast", page_icon="🎙️", layout="wide", initial_sidebar_state="expanded")
+CSS_PATH = Path(__file__).resolve().parent / "static" / "pawdcast.css"
 
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
+@functools.lru_cache(maxsize=None)
+def page_css():
+    """Markup that styles the page, built once per process.
 
-/* Base */
-.stApp { 
-    background: linear-gradient(160deg, #ffffff 0%, #f8fafc 100%); 
-    font-family: 'Inter', -apple-system, sans-serif; 
-    color: #1e293b;
-}
-
-/* Hide defaults */
-#MainMenu, footer, header { visibility: hidden; }
-.stDeployButton { display: none; }
-
-/* Header — Logo LEFT of Title */
-.header-container { 
-    display: flex; 
-    align-items: center; 
-    justify-content: center; 
-    gap: 1rem; 
-    padding: 1.5rem 0; 
-}
-.logo-img { 
-    width: 48px; 
-    height: 48px; 
-    border-radius: 12px;
-    box-shadow: 0 4px 12px rgba(249, 115, 22, 0.2);
-}
-.header-text {
-    display: flex;
-    flex-direction: column;
-    gap: 0.1rem;
-}
-.main-title { 
-    font-size: 1.75rem; 
-    font-weight: 800; 
-    background: linear-gradient(135deg, #f97316, #ea580c); 
-    -webkit-background-clip: text; 
-    -webkit-text-fill-color: transparent; 
-    margin: 0;
-    letter-spacing: -0.5px;
-}
-.subtitle { 
-    color: #64748b; 
-    font-size: 0.85rem;
-    font-weight: 500;
-    margin: 0;
-}
-
-/* Sidebar */
-section[data-testid="stSidebar"] { 
-    background: linear-gradient(180deg, #ffffff 0%, #f8fafc 100%);
-    border-right: 1px solid #e2e8f0;
-}
-section[data-testid="stSidebar"] .block-container {
-    padding: 1rem;
-}
-
-/* All Buttons — Orange Theme */
-.stButton > button,
-.stDownloadButton > button {
-    background: linear-gradient(135deg, #f97316 0%, #ea580c 100%) !important;
-    color: white !important;
-    font-weight: 600 !important;
-    border: none !important;
-    border-radius: 10px !important;
-    padding: 0.6rem 1.2rem !important;
-    box-shadow: 0 4px 14px rgba(249, 115, 22, 0.3) !important;
-    transition: all 0.25s ease !important;
-}
-.stButton > button:hover,
-.stDownloadButton > button:hover {
-    transform: translateY(-2px) !important;
-    box-shadow: 0 6px 20px rgba(249, 115, 22, 0.4) !important;
-}
-
-/* Badges */
-.badge-free { 
-    display: inline-block;
-    background: linear-gradient(135deg, #f97316, #ea580c);
-    color: white;
-    padding: 0.4rem 1rem; 
-    border-radius: 50px; 
-    font-size: 0.75rem;
-    font-weight: 700;
-    letter-spacing: 0.5px;
-}
-.badge-ready {
-    display: inline-block;
-    background: linear-gradient(135deg, #10b981, #059669);
-    color: white;
-    padding: 0.3rem 0.8rem;
-    border-radius: 50px;
-    font-size: 0.7rem;
-    font-weight: 600;
-}
-.badge-waiting {
-    display: inline-block;
-    background: linear-gradient(135deg, #f59e0b, #d97706);
-    color: white;
-    padding: 0.3rem 0.8rem;
-    border-radius: 50px;
-    font-size: 0.7rem;
-    font-weight: 600;
-}
-
-/* Cards */
-.card {
-    background: white;
-    border-radius: 16px;
-    padding: 1.25rem;
-    margin: 1rem 0;
-    border: 1px solid #e2e8f0;
-    box-shadow: 0 2px 8px rgba(0,0,0,0.04);
-}
-.card-title {
-    font-size: 1rem;
-    font-weight: 700;
-    color: #1e293b;
-    margin: 0 0 0.25rem 0;
-    display: flex;
-    align-items: center;
-    gap: 0.5rem;
-}
-.card-desc {
-    color: #64748b;
-    font-size: 0.85rem;
-    margin: 0;
-}
-
-/* Mode Pills */
-.stRadio > div { 
-    display: flex; 
-    gap: 0.5rem; 
-    justify-content: center;
-    flex-wrap: wrap;
-}
-.stRadio > div > label { 
-    background: white; 
-    border-radius: 50px; 
-    padding: 0.5rem 1rem; 
-    border: 1.5px solid #e2e8f0; 
-    font-weight: 600; 
-    font-size: 0.85rem;
-    transition: all 0.2s ease;
-    cursor: pointer;
-}
-.stRadio > div > label:hover { 
-    border-color: #f97316; 
-    background: #fff7ed;
-}
-
-/* Inputs */
-.stTextArea textarea, .stTextInput input {
-    border-radius: 10px !important;
-    border: 1.5px solid #e2e8f0 !important;
-    font-size: 0.9rem !important;
-    background: #fafafa !important;
-    transition: all 0.2s !important;
-}
-.stTextArea textarea:focus, .stTextInput input:focus {
-    border-color: #f97316 !important;
-    box-shadow: 0 0 0 3px rgba(249, 115, 22, 0.1) !important;
-    background: white !important;
-}
+    With static serving on (.streamlit/config.toml) it is a short <link> the
+    browser caches, so reruns don't re-send the stylesheet. Streamlit serves
+    static files with their own content type since 1.56 (the requirements
+    floor); before that .css went out as text/plain, which browsers refuse.
+    Only with static serving turned off is the stylesheet inlined.
+    """
+    css = CSS_PATH.read_text()
+    if st.get_option("server.enableStaticServing"):
+        return f'<link rel="stylesheet" href="app/static/{CSS_PATH.name}?v={hashlib.md5(css.encode()).hexdigest()[:8]}">'
+    return f"<style>\n{css}</style>"
 
-/* File Uploader */
-.stFileUploader > div > div {
-    border-radius: 10px !important;
-    border: 2px dashed #e2e8f0 !important;
-    background: #fafafa !important;
-}
-.stFileUploader > div > div:hover {
-    border-color: #f97316 !important;
-    background: #fff7ed !important;
-}
-
-/* Progress */
-.stProgress > div > div {
-    background: linear-gradient(135deg, #f97316, #ea580c) !important;
-    border-radius: 50px !important;
-}
-
-/* Expander */
-.streamlit-expanderHeader {
-    background: #f8fafc !important;
-    border-radius: 10px !important;
-    font-weight: 600 !important;
-}
-
-/* Divider */
-.divider { 
-    height: 1px; 
-    background: linear-gradient(90deg, transparent, #e2e8f0, transparent); 
-    margin: 1.5rem 0; 
-}
-
-/* Footer */
-.footer { 
-    text-align: center; 
-    padding: 2rem 0; 
-    color: #94a3b8; 
-    font-size: 0.8rem;
-    margin-top: 2rem;
-    border-top: 1px solid #e2e8f0;
-}
-.footer a { 
-    color: #f97316; 
-    text-decoration: none;
-    font-weight: 600;
-}
-
-/* Section headers */
-.section-header {
-    display: flex;
-    align-items: center;
-    gap: 0.5rem;
-    font-weight: 700;
-    color: #475569;
-    font-size: 0.8rem;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    margin: 1rem 0 0.5rem 0;
-}
-</style>
-""", unsafe_allow_html=True)
+def default_api_key():
+    """GEMINI_API_KEY from .streamlit/secrets.toml, else the environment."""
+    try:
+        return st.secrets.get("GEMINI_API_KEY", "") or os.environ.get("GEMINI_API_KEY", "")
+    except Exception:
+        # st.secrets raises when there is no secrets.toml at all
+        return os.environ.get("GEMINI_API_KEY", "")
 
 # ============================================================================
 # CONFIG
@@ -259,119 +74,1380 @@ GEMINI_VOICES = {
 }
 SKIT_MODEL = "gemini-2.0-flash"
 TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_PROMPT = 'Say this naturally: "{text}"'
+DIALOGUE_PROMPT = "TTS the following conversation between Speaker 1 and Speaker 2:\n{dialogue}"
+TTS_SAMPLE_RATE = 24000
+# Voiced lines are joined in memory into one dialogue track (see dialogue_track):
+# LINE_GAP_SECONDS of silence between lines, LINE_FADE_SECONDS ramps at every cut
+LINE_GAP_SECONDS = float(os.environ.get("PAWDCAST_LINE_GAP_SECONDS", "0"))
+LINE_FADE_SECONDS = 0.01
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL")
+# Batch TTS: each line must last within this factor of its share of the total by text length
+ALIGN_RATIO = 3.0
+TTS_CONCURRENCY = int(os.environ.get("PAWDCAST_TTS_CONCURRENCY", "4"))
+API_RETRIES = 5
+API_BACKOFF = 1.0
+# One keep-alive pool for every Gemini request, shared by all keys and sessions
+API_CONNECTIONS = int(os.environ.get("PAWDCAST_API_CONNECTIONS", "16"))
+API_KEEPALIVE_SECONDS = 120
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
 LOGO_URL = "https://news.shib.io/wp-content/uploads/2025/12/Black-White-Simple-Modern-Neon-Griddy-Bold-Technology-Pixel-Electronics-Store-Logo-1.png"
 
+RENDER_WIDTH = 1920
+RENDER_HEIGHT = 1080
+RENDER_FPS = 30
+RENDER_ENGINE = "single_pass"
+RENDER_WORKERS = int(os.environ.get("PAWDCAST_RENDER_WORKERS", os.cpu_count() or 1))
+# Long-form: past this many lines, engines that run ffmpeg once per line hand
+# over to single_pass, whose process count and memory don't grow with lines
+LONGFORM_LINES = int(os.environ.get("PAWDCAST_LONGFORM_LINES", "80"))
+PER_LINE_ENGINES = ("legacy", "incremental")
+AUDIO_NORMALIZE = "aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+# Output settings per render profile. A preview is a quick low-res check of
+# speaker switching and timing before the full-quality publish render.
+RENDER_PROFILES = {
+    "publish": {"width": RENDER_WIDTH, "height": RENDER_HEIGHT, "fps": RENDER_FPS,
+                "video_args": ["-preset", "fast", "-crf", "23"], "audio_bitrate": "192k"},
+    "preview": {"width": 640, "height": 360, "fps": 15,
+                "video_args": ["-preset", "ultrafast", "-tune", "fastdecode", "-crf", "30"], "audio_bitrate": "96k"},
+}
+
+# Aspect ratios a video can be published in, all from one render. Each format
+# is fit from the template itself: letterboxed ("pad") or centre-cropped to fill.
+OUTPUT_FORMATS = {
+    "landscape": {"label": "16:9", "width": RENDER_WIDTH, "height": RENDER_HEIGHT, "fit": "pad"},
+    "vertical": {"label": "9:16", "width": 1080, "height": 1920, "fit": "crop"},
+    "square": {"label": "1:1", "width": 1080, "height": 1080, "fit": "crop"},
+}
+
+# Captions are an ASS script on the publish canvas (libass scales it for
+# previews). Lines longer than CAPTION_MAX_CHARS are shown in timed chunks.
+CAPTION_MODES = ("off", "burn", "soft", "both")
+CAPTION_FONT = "DejaVu Sans"
+CAPTION_SIZE = 76
+CAPTION_MAX_CHARS = 42
+
+# Render-ready intermediate every cached template is normalized to. Template
+# loops use the same video args so they can be joined with the outro by copy.
+NORMALIZE_VIDEO_ARGS = [
+    "-c:v", "libx264", "-preset", "fast", "-crf", "18", "-pix_fmt", "yuv420p", "-profile:v", "high",
+    "-g", str(RENDER_FPS), "-keyint_min", str(RENDER_FPS), "-sc_threshold", "0", "-bf", "0",
+    "-video_track_timescale", str(RENDER_FPS * 512),
+]
+NORMALIZE_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "192k", "-ar", "48000", "-ac", "2"]
+NORMALIZE_ARGS = NORMALIZE_VIDEO_ARGS + NORMALIZE_AUDIO_ARGS
+LOOP_SECONDS = 60
+
+# Speech boundary detection (Audio Mode)
+SPLIT_SAMPLE_RATE = 8000
+SPLIT_FRAME_SECONDS = 0.02
+SPLIT_CHUNK_SECONDS = 30
+# split_audio_file cuts on packet boundaries, so packets are this many samples (10 ms)
+SPLIT_PACKET_SAMPLES = TTS_SAMPLE_RATE // 100
+
+CACHE_DIR = Path(os.environ.get("PAWDCAST_CACHE_DIR", Path.home() / ".cache" / "pawdcast"))
+TEMPLATE_CACHE_MB = int(os.environ.get("PAWDCAST_TEMPLATE_CACHE_MB", "2048"))
+TTS_CACHE_MB = int(os.environ.get("PAWDCAST_TTS_CACHE_MB", "512"))
+SEGMENT_CACHE_MB = int(os.environ.get("PAWDCAST_SEGMENT_CACHE_MB", "2048"))
+INGEST_CHUNK = 8 * 1024 * 1024
+
+# Background render jobs (folders under JOBS_DIR, pruned after JOB_RETENTION_HOURS)
+JOBS_DIR = CACHE_DIR / "jobs"
+JOB_WORKERS = int(os.environ.get("PAWDCAST_JOB_WORKERS", "2"))
+JOB_RETENTION_HOURS = float(os.environ.get("PAWDCAST_JOB_RETENTION_HOURS", "24"))
+JOB_POLL_SECONDS = 1.0
+
+# Finished videos live in the output store and are linked into static/media,
+# which Streamlit's static route serves from disk; with PAWDCAST_MEDIA_URL (a
+# public URL proxied to MEDIA_HOST:MEDIA_PORT), a local range-serving HTTP
+# server streams them instead
+OUTPUT_STORE_MB = int(os.environ.get("PAWDCAST_OUTPUT_MB", "4096"))
+# Streamlit won't serve a static file over 200 MB and turns static serving off
+# at startup when static/ holds more than 1 GB
+STATIC_MEDIA_DIR = CSS_PATH.parent / "media"
+STATIC_MEDIA_MB = int(os.environ.get("PAWDCAST_STATIC_MEDIA_MB", "768"))
+STATIC_FILE_MAX_BYTES = 200 * 1024 * 1024
+MEDIA_HOST = os.environ.get("PAWDCAST_MEDIA_HOST", "127.0.0.1")
+MEDIA_PORT = int(os.environ.get("PAWDCAST_MEDIA_PORT", "8599"))
+MEDIA_BASE_URL = os.environ.get("PAWDCAST_MEDIA_URL")
+
 # ============================================================================
 # HELPERS
 # ============================================================================
-def run_cmd(cmd, desc=""):
-    result = subprocess.run(cmd, capture_output=True, text=True)
+_trace = contextvars.ContextVar("trace", default=None)
+_stage = contextvars.ContextVar("stage", default="")
+
+class Trace:
+    """Timed spans of one render: pipeline stages, API calls and every child process.
+
+    Child events carry their CPU seconds and peak RSS from os.wait4. to_chrome()
+    gives Chrome trace-event JSON that chrome://tracing or Perfetto can load.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, cat, start, end, **args):
+        with self._lock:
+            tid = self._threads.setdefault(threading.get_ident(), len(self._threads) + 1)
+            self.events.append({"name": name, "cat": cat, "start": start - self.t0, "dur": end - start, "tid": tid, **args})
+
+    def stages(self):
+        """Per-stage wall time, plus the child process count, CPU and peak RSS inside it."""
+        out = collections.defaultdict(lambda: {"wall_s": 0.0, "procs": 0, "cpu_s": 0.0, "peak_rss_mb": 0.0})
+        for e in self.events:
+            if e["cat"] == "stage":
+                out[e["name"]]["wall_s"] += e["dur"]
+            elif e["cat"] == "proc":
+                entry = out[e["stage"] or "other"]
+                entry["procs"] += 1
+                entry["cpu_s"] += e["cpu_s"]
+                entry["peak_rss_mb"] = max(entry["peak_rss_mb"], e["rss_mb"])
+        return {name: {k: round(v, 3) for k, v in d.items()} for name, d in out.items()}
+
+    def to_chrome(self):
+        events = [{
+            "name": e["name"], "cat": e["cat"], "ph": "X", "pid": 1, "tid": e["tid"],
+            "ts": round(e["start"] * 1e6), "dur": round(e["dur"] * 1e6),
+            "args": {k: v for k, v in e.items() if k not in ("name", "cat", "start", "dur", "tid")},
+        } for e in self.events]
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.name or "render"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"name": self.name, "started": self.started, "stages": self.stages()}}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome(), f)
+
+@contextlib.contextmanager
+def tracing(name=""):
+    """Collect spans from this thread, and from run_parallel work it starts, into a Trace."""
+    trace = Trace(name)
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+@contextlib.contextmanager
+def span(name, cat="stage"):
+    """Time a block on the active trace; stage spans also label the processes run inside them."""
+    trace = _trace.get()
+    token = _stage.set(name) if cat == "stage" else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if token:
+            try:
+                _stage.reset(token)
+            except ValueError:
+                pass  # a generator's span closed from another context (e.g. by gc)
+        if trace:
+            trace.add(name, cat, start, time.perf_counter())
+
+def run_cmd(cmd, desc="", progress_cb=None, duration=None, stdin=None):
+    """Run a command to completion; raises with its stderr on failure.
+
+    The run is recorded on the active trace with its wall time, CPU time and
+    peak RSS. For ffmpeg, passing progress_cb and the expected output
+    duration adds -progress pipe:1 and calls progress_cb(fraction) as time
+    is actually encoded. stdin (bytes or a NumPy array) is written to the
+    command's standard input from a thread, without copying it.
+    """
+    track = bool(progress_cb and duration and cmd[0] == "ffmpeg")
+    if track:
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdin=None if stdin is None else subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    reader.start()
+    if stdin is not None:
+        def feed():
+            # a command that fails early closes its end; its stderr says why
+            with contextlib.suppress(OSError):
+                with proc.stdin.buffer as pipe:
+                    pipe.write(memoryview(stdin).cast("B"))
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+    stdout = []
+    for line in proc.stdout:
+        if not track:
+            stdout.append(line)
+            continue
+        key, _, value = line.strip().partition("=")
+        if key == "out_time_us" and value.isdigit():
+            progress_cb(min(1.0, int(value) / 1e6 / duration))
+    reader.join()
+    if stdin is not None:
+        writer.join()
+    proc.stdout.close()
+    proc.stderr.close()
+    # reap it ourselves: wait4 also hands back the child's own CPU time and peak RSS
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    trace = _trace.get()
+    if trace:
+        trace.add(desc or Path(cmd[0]).name, "proc", start, time.perf_counter(), stage=_stage.get(),
+                  cpu_s=round(usage.ru_utime + usage.ru_stime, 3), rss_mb=round(usage.ru_maxrss / 1024, 1),
+                  returncode=proc.returncode, cmd=" ".join(cmd[:8]))
+    result = subprocess.CompletedProcess(cmd, proc.returncode, "".join(stdout), "".join(stderr))
     if result.returncode != 0:
         raise Exception(f"Error ({desc}): {result.stderr}")
     return result
 
-def check_ffmpeg():
+def run_parallel(fn, items, workers=1, progress_cb=None, progress_range=(0.0, 1.0), label=""):
+    """Run fn(i, item) for every item on a bounded thread pool.
+
+    Work happens in ffmpeg/network calls, so threads are enough to keep the
+    cores busy. items may be a generator: each item is submitted as soon as
+    it is produced. Results come back in input order; progress_cb is called
+    from the calling thread, so it is safe to update Streamlit widgets from it.
+    """
+    lo, hi = progress_range
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
     try:
-        run_cmd(["ffmpeg", "-version"], "ffmpeg")
-        return True
-    except:
-        return False
+        # each task runs in a copy of the caller's context, so it reports to the caller's trace
+        futures = [pool.submit(contextvars.copy_context().run, fn, i, item) for i, item in enumerate(items)]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if progress_cb: progress_cb(lo + (hi - lo) * done / len(futures), f"{label} {done}/{len(futures)}")
+        return [future.result() for future in futures]
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
-def get_duration(path):
-    result = run_cmd(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path])
-    return float(result.stdout.strip())
+def ffmpeg_threads(workers):
+    """Per-process -threads value so `workers` parallel ffmpegs don't oversubscribe the CPU."""
+    return str(max(1, (os.cpu_count() or 1) // max(1, workers)))
+
+# Also swallows markdown bold around the header: **Speaker 1:** "text"
+SPEAKER_HEADER = re.compile(r'Speaker\s*(\d+)\s*:[\s*]*')
+
+class SkitStreamParser:
+    """Incremental skit parser: feed text as it streams in, get finished lines back.
+
+    A quoted line (Speaker 1: "text") is finished at its closing quote; an
+    unquoted one when the next Speaker N: header arrives, or at close().
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        return self._drain(final=False)
+
+    def close(self):
+        return self._drain(final=True)
+
+    def _drain(self, final):
+        lines = []
+        while True:
+            header = SPEAKER_HEADER.search(self.buffer, self.pos)
+            if not header or (header.end() == len(self.buffer) and not final):
+                break
+            start = header.end()
+            nxt = SPEAKER_HEADER.search(self.buffer, start)
+            close_quote = self.buffer.find('"', start + 1) if self.buffer.startswith('"', start) else -1
+            if close_quote != -1 and (not nxt or close_quote < nxt.start()):
+                text, self.pos = self.buffer[start + 1:close_quote], close_quote + 1
+            elif nxt:
+                text, self.pos = self.buffer[start:nxt.start()], nxt.start()
+            elif final:
+                text, self.pos = self.buffer[start:], len(self.buffer)
+            else:
+                break
+            text = text.strip().strip('*"\'').strip()
+            if text:
+                lines.append((f"Speaker {header.group(1)}", text))
+        return lines
 
 def parse_skit(text):
     if not text: return []
-    pattern = r'Speaker\s*(\d+)\s*:\s*["""]([^"""]+)["""]'
-    matches = re.findall(pattern, text, re.MULTILINE | re.DOTALL)
-    if not matches:
-        pattern = r'Speaker\s*(\d+)\s*:\s*(.+?)(?=Speaker\s*\d+:|$)'
-        matches = re.findall(pattern, text, re.MULTILINE | re.DOTALL)
-        matches = [(n, l.strip().strip('"\'""')) for n, l in matches]
-    return [(f"Speaker {n}", l.strip()) for n, l in matches if l.strip()]
+    parser = SkitStreamParser()
+    return parser.feed(text) + parser.close()
 
 # ============================================================================
-# AUDIO SPLITTER
+# MEDIA METADATA
 # ============================================================================
-def analyze_audio_for_splits(audio_path, num_segments):
-    total_duration = get_duration(audio_path)
+_probe_cache = {}
+_probe_lock = threading.Lock()
+_ffmpeg_caps = None
+
+def ffmpeg_capabilities():
+    """ffmpeg version, encoders and filters, detected once per process (None if missing).
+
+    A failed detection isn't remembered, so ffmpeg installed after startup is found.
+    """
+    global _ffmpeg_caps
+    if _ffmpeg_caps:
+        return _ffmpeg_caps
+    try:
+        version = run_cmd(["ffmpeg", "-version"], "ffmpeg").stdout.splitlines()[0]
+        encoders = run_cmd(["ffmpeg", "-hide_banner", "-encoders"], "ffmpeg encoders").stdout
+        filters = run_cmd(["ffmpeg", "-hide_banner", "-filters"], "ffmpeg filters").stdout
+    except Exception:
+        return None
     
-    # Try detecting silence gaps
-    cmd = ["ffmpeg", "-i", audio_path, "-af", "silencedetect=noise=-50dB:d=0.8", "-f", "null", "-"]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    ends = [float(m.group(1)) for m in re.finditer(r'silence_end: (\d+\.?\d*)', result.stderr) if float(m.group(1)) > 1.0]
+    def names(listing):
+        # rows look like " V....D libx264   description" / " TSC overlay   VV->V  description"
+        return {parts[1] for parts in (line.split() for line in listing.splitlines()) if len(parts) > 2 and parts[1] != "="}
     
-    if len(ends) < num_segments - 1:
-        cmd = ["ffmpeg", "-i", audio_path, "-af", "silencedetect=noise=-32dB:d=0.38", "-f", "null", "-"]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        ends = [float(m.group(1)) for m in re.finditer(r'silence_end: (\d+\.?\d*)', result.stderr)]
+    _ffmpeg_caps = {"version": version, "encoders": names(encoders), "filters": names(filters)}
+    return _ffmpeg_caps
+
+def check_ffmpeg():
+    return ffmpeg_capabilities() is not None
+
+def has_filter(name):
+    caps = ffmpeg_capabilities()
+    return bool(caps) and name in caps["filters"]
+
+@functools.lru_cache(maxsize=256)
+def _file_digest(path, size, mtime_ns):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_digest(path):
+    """Content hash of a file, recomputed only when its size or mtime changes."""
+    stat = os.stat(path)
+    return _file_digest(str(path), stat.st_size, stat.st_mtime_ns)
+
+def wav_duration(path):
+    """Duration of a PCM WAV read straight from its header."""
+    with wave.open(str(path), "rb") as wf:
+        return wf.getnframes() / wf.getframerate()
+
+def ffprobe_duration(path):
+    """One uncached ffprobe call, for files probed once (e.g. a finished render)."""
+    result = run_cmd(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", str(path)], "ffprobe")
+    return float(result.stdout.strip())
+
+def probe_duration(path):
+    """ffprobe duration, cached for the process by file content hash."""
+    key = file_digest(path)
+    with _probe_lock:
+        if key in _probe_cache:
+            return _probe_cache[key]
+    duration = ffprobe_duration(path)
+    with _probe_lock:
+        _probe_cache[key] = duration
+    return duration
+
+def get_duration(path):
+    if str(path).lower().endswith(".wav"):
+        try:
+            duration = wav_duration(path)
+            if duration > 0:
+                return duration
+        except (wave.Error, EOFError):
+            pass  # compressed/extensible WAV — let ffprobe handle it
+    return probe_duration(path)
+
+# ============================================================================
+# AUDIO SPLITTER
+# ============================================================================
+def pcm_energy_db(pcm, sample_rate=SPLIT_SAMPLE_RATE, frame_seconds=SPLIT_FRAME_SECONDS):
+    """Loudness in dB of each frame of 16-bit mono PCM (last frame zero-padded)."""
+    frame = int(sample_rate * frame_seconds)
+    pcm = pcm.astype(np.float32)
+    if len(pcm) % frame:
+        pcm = np.pad(pcm, (0, frame - len(pcm) % frame))
+    rms = np.sqrt(np.mean(pcm.reshape(-1, frame) ** 2, axis=1))
+    return 20 * np.log10(rms + 1.0)
+
+def frame_energy_db(audio_path):
+    """Decode audio once to mono PCM and return (per-frame loudness in dB, duration).
+
+    PCM is read from ffmpeg in SPLIT_CHUNK_SECONDS blocks, so memory stays at
+    one block plus one float per SPLIT_FRAME_SECONDS frame however long the
+    input is.
+    """
+    frame = int(SPLIT_SAMPLE_RATE * SPLIT_FRAME_SECONDS)
+    block = frame * int(SPLIT_CHUNK_SECONDS / SPLIT_FRAME_SECONDS)
+    proc = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", str(audio_path), "-f", "s16le", "-ac", "1", "-ar", str(SPLIT_SAMPLE_RATE), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    energies = []
+    samples = 0
+    while True:
+        buf = proc.stdout.read(block * 2)
+        if not buf:
+            break
+        pcm = np.frombuffer(buf, dtype="<i2")
+        samples += len(pcm)
+        energies.append(pcm_energy_db(pcm))
+    stderr = proc.stderr.read().decode(errors="replace")
+    if proc.wait() != 0:
+        raise Exception(f"Error (decode for split detection): {stderr}")
+    energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    return energy, samples / SPLIT_SAMPLE_RATE
+
+def _otsu_threshold(values):
+    """Level that best separates values into two classes (pause vs speech)."""
+    hist, edges = np.histogram(values, bins=256)
+    centers = (edges[:-1] + edges[1:]) / 2
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * centers) / np.maximum(w0, 1)
+    m1 = (np.sum(hist * centers) - np.cumsum(hist * centers)) / np.maximum(w1, 1)
+    return centers[np.argmax(w0 * w1 * (m0 - m1) ** 2)]
+
+def _pauses_below(energy, threshold):
+    """(start, end, score) for interior runs of frames below threshold; score is length x depth."""
+    quiet = np.concatenate(([0], (energy < threshold).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(quiet))
+    starts, ends = edges[::2], edges[1::2]
+    interior = (starts > 0) & (ends < len(energy))
+    pauses = []
+    for s, e in zip(starts[interior], ends[interior]):
+        pauses.append((s, e, (e - s) * float(threshold - energy[s:e].mean())))
+    return pauses
+
+def find_speech_boundaries(energy, num_segments, frame_seconds=SPLIT_FRAME_SECONDS):
+    """Split times (seconds) at the num_segments - 1 most prominent pauses.
+
+    The pause level comes from the signal itself (Otsu on smoothed frame
+    loudness) and is relaxed towards the speech level until enough pauses
+    exist. Lines delivered with no gap at all are split at the quietest
+    remaining moments rather than at equal intervals. Every pick is kept
+    half an average line away from the others and the ends; that spacing is
+    halved only when there aren't enough picks. Audio shorter than a frame
+    per line gets fewer than num_segments - 1 splits.
+    """
+    need = num_segments - 1
+    if need <= 0 or len(energy) < 2:
+        return []
+    smooth = np.convolve(energy, np.ones(5) / 5, mode="same")
+    floor = _otsu_threshold(smooth)
+    ceiling = np.median(smooth[smooth >= floor]) if np.any(smooth >= floor) else floor
     
-    if len(ends) >= num_segments - 1:
-        split_times = ends[:num_segments - 1]
-    else:
-        step = total_duration / num_segments
-        split_times = [step * i for i in range(1, num_segments)]
+    pauses = []
+    for threshold in np.linspace(floor, ceiling, 16):
+        pauses = _pauses_below(smooth, threshold)
+        if len(pauses) >= need:
+            break
+    # the most prominent pauses first, then the quietest frames
+    candidates = [(s + e) // 2 for s, e, _ in sorted(pauses, key=lambda p: p[2], reverse=True)]
+    candidates += [int(i) for i in np.argsort(smooth, kind="stable")]
+    
+    points = []
+    gap = max(1, len(smooth) // (2 * num_segments))
+    while len(points) < need and gap >= 1:
+        blocked = np.zeros(len(smooth), dtype=bool)
+        blocked[:gap] = blocked[-gap:] = True
+        for p in points:
+            blocked[max(0, p - gap):p + gap] = True
+        for idx in candidates:
+            if len(points) >= need:
+                break
+            if not blocked[idx]:
+                points.append(idx)
+                blocked[max(0, idx - gap):idx + gap] = True
+        gap //= 2
     
-    return split_times, total_duration
+    return [round(float(p * frame_seconds), 3) for p in sorted(points)]
+
+def analyze_audio_for_splits(audio_path, num_segments):
+    energy, total_duration = frame_energy_db(audio_path)
+    return find_speech_boundaries(energy, num_segments), total_duration
 
 def split_audio_file(audio_path, split_times, total_duration, output_dir):
+    """Cut audio at split_times into segment_NN.wav files with one ffmpeg run.
+
+    The segment muxer decodes the input once, however many cuts there are;
+    cuts land on the next SPLIT_PACKET_SAMPLES packet boundary.
+    """
     output_files = []
     times = [0] + split_times + [total_duration]
+    # the muxer rejects an empty -segment_times; one segment longer than the track keeps it whole
+    cuts = (["-segment_times", ",".join(f"{t:.3f}" for t in split_times)] if split_times
+            else ["-segment_time", str(math.ceil(total_duration) + 1)])
+    
+    run_cmd([
+        "ffmpeg", "-y",
+        "-i", audio_path,
+        "-af", f"aresample={TTS_SAMPLE_RATE},asetnsamples=n={SPLIT_PACKET_SAMPLES}:p=0",
+        "-c:a", "pcm_s16le",
+        "-ac", "1",
+        "-f", "segment",
+        *cuts,
+        "-reset_timestamps", "1",
+        os.path.join(output_dir, "segment_%02d.wav")
+    ], "split")
     
     for i in range(len(times) - 1):
-        start = times[i]
-        end = times[i + 1]
-        duration = max(0.1, end - start)
-        output_path = os.path.join(output_dir, f"segment_{i:02d}.wav")
-        
-        run_cmd([
-            "ffmpeg", "-y",
-            "-i", audio_path,
-            "-ss", str(start),
-            "-t", str(duration),
-            "-c:a", "pcm_s16le",
-            "-ar", "24000",
-            "-ac", "1",
-            output_path
-        ], f"split {i}")
-        
         output_files.append({
-            "path": output_path,
-            "start": start,
-            "duration": duration
+            "path": os.path.join(output_dir, f"segment_{i:02d}.wav"),
+            "start": times[i],
+            "duration": max(0.1, times[i + 1] - times[i])
         })
     
     return output_files
 
+# ============================================================================
+# CACHES
+# ============================================================================
+class DiskCache:
+    """Size-capped on-disk store of files keyed by content hash.
+
+    Files are written under a temporary name and moved into place, so
+    concurrent sessions never see a half-written entry. Reads touch the
+    file's mtime and the least recently used entries are evicted once the
+    store grows past max_bytes, except those pinned() by a running render.
+    """
+
+    suffix = ".bin"
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._pins = collections.Counter()
+
+    @contextlib.contextmanager
+    def pinned(self, *keys):
+        """Keep keys, and the entries derived from them, from being evicted while in use."""
+        with self._lock:
+            self._pins.update(keys)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins.subtract(keys)
+                self._pins = +self._pins
+
+    def derived_from(self, key, parent):
+        """Whether key is parent or built from it; derived entries are pinned and evicted with it."""
+        return key == parent
+
+    def key_lock(self, key):
+        """Lock held while one entry is built, so it is built once; other keys build meanwhile."""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def path_for(self, key):
+        return self.root / f"{key}{self.suffix}"
+
+    def part_path(self, key):
+        """Private temp path for building an entry before commit()."""
+        return self.root / f".{key}.{os.getpid()}.{threading.get_ident()}.part{self.suffix}"
+
+    def get(self, key):
+        """Return the entry path and mark it used, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return str(path)
+
+    def commit(self, part, key, **meta):
+        """Atomically move a finished part file into place."""
+        os.replace(part, self.path_for(key))
+        self._write_meta(key, meta)
+        self._evict(keep=key)
+        return str(self.path_for(key))
+
+    def _write_meta(self, key, meta):
+        part = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}.json"
+        with open(part, "w") as f:
+            json.dump({**meta, "created": time.time()}, f)
+        os.replace(part, self.root / f"{key}.json")
+
+    def _read_meta(self, key):
+        try:
+            with open(self.root / f"{key}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def entries(self):
+        """List cached entries with their metadata, most recently used first (for the UI)."""
+        out = [{
+            "key": key,
+            "name": self._read_meta(key).get("name", ""),
+            "bytes": size,
+            "last_used": last_used,
+            "path": str(self.path_for(key)),
+        } for key, size, last_used in self.scan()]
+        return sorted(out, key=lambda e: e["last_used"], reverse=True)
+
+    def scan(self):
+        """(key, bytes, last used) of every entry from one directory scan, without reading metadata."""
+        out = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(self.suffix) and not entry.name.startswith("."):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    out.append((entry.name[:-len(self.suffix)], stat.st_size, stat.st_mtime))
+        return out
+
+    def usage(self):
+        """(entry count, total bytes) from one directory scan, without reading metadata."""
+        scanned = self.scan()
+        return len(scanned), sum(size for _, size, _ in scanned)
+
+    def purge(self, key=None):
+        """Remove one entry, or every entry when key is None. Returns the count removed."""
+        keys = [key] if key else [k for k, _, _ in self.scan()]
+        for k in keys:
+            self.path_for(k).unlink(missing_ok=True)
+            (self.root / f"{k}.json").unlink(missing_ok=True)
+        return len(keys)
+
+    def _evict(self, keep=None):
+        scanned = self.scan()
+        total = sum(size for _, size, _ in scanned)
+        if total <= self.max_bytes:
+            return
+        with self._lock:
+            pins = list(self._pins)
+        in_use = lambda k: k == keep or any(self.derived_from(k, p) for p in pins)
+        gone = set()
+        for key, _, _ in sorted(scanned, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            family = [(k, size) for k, size, _ in scanned if k not in gone and self.derived_from(k, key)]
+            if not family or any(in_use(k) for k, _ in family):
+                continue
+            self.purge(key)
+            gone.update(k for k, _ in family)
+            total -= sum(size for _, size in family)
+
+class TemplateStore(DiskCache):
+    """Normalized templates, keyed by upload content.
+
+    A template is scaled/padded to the render canvas and re-encoded with
+    NORMALIZE_ARGS once; later runs with the same upload reuse that file.
+    """
+
+    suffix = ".mp4"
+
+    def _hasher(self):
+        h = hashlib.sha256()
+        h.update(" ".join([fit_filter()] + NORMALIZE_ARGS).encode())
+        return h
+
+    def key_for(self, data):
+        h = self._hasher()
+        h.update(data)
+        return h.hexdigest()[:32]
+
+    def src_path(self, key):
+        return self.root / f".{key}.src"
+
+    def available(self, key):
+        return self.path_for(key).exists() or self.src_path(key).exists()
+
+    def stage(self, data, name=""):
+        """Park an upload's bytes for build() and return its key.
+
+        data is any buffer, e.g. UploadedFile.getbuffer(); it is hashed and
+        written through a memoryview, never copied. Nothing is written when
+        the template is already normalized or staged.
+        """
+        with memoryview(data) as view:
+            key = self.key_for(view)
+            src = self.src_path(key)
+            if not self.get(key) and not src.exists():
+                part = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}.src"
+                with open(part, "wb") as f:
+                    f.write(view)
+                os.replace(part, src)
+        return key
+
+    def build(self, key, name="", progress_cb=None):
+        """Return the normalized template path for a staged key, normalizing it if needed.
+
+        The upload itself is kept next to it as "<key>-source" (see source()).
+        """
+        with self.key_lock(key):
+            cached = self.get(key)
+            if cached:
+                return cached
+            src = self.src_path(key)
+            if not src.exists():
+                raise Exception(f"Template {name or key} is no longer cached, please upload it again")
+            try:
+                path = self._normalize(key, src, name, progress_cb)
+            except Exception:
+                src.unlink(missing_ok=True)
+                raise
+            self.commit(src, f"{key}-source", name=f"{name} (source)")
+            return path
+
+    def source(self, key):
+        """The original upload of a template, or its normalized file once that has been evicted.
+
+        Formats other than 16:9 are fit from the upload, not from the padded canvas.
+        """
+        return self.get(f"{key}-source") or self.get(key)
+
+    def add_file(self, src_path):
+        """Return the normalized template path for a file, hashing it in INGEST_CHUNK reads."""
+        h = self._hasher()
+        with open(src_path, "rb") as f:
+            for chunk in iter(lambda: f.read(INGEST_CHUNK), b""):
+                h.update(chunk)
+        key = h.hexdigest()[:32]
+        with self.key_lock(key):
+            return self.get(key) or self._normalize(key, src_path, Path(src_path).name)
+
+    def derived_from(self, key, parent):
+        # loops and proxies are keyed "<template key>-<variant>"
+        return key == parent or key.startswith(f"{parent}-")
+
+    def purge(self, key=None):
+        """Remove a template with its loops and proxies, or everything when key is None."""
+        if key is None:
+            for src in self.root.glob(".*.src"):
+                src.unlink(missing_ok=True)
+            return super().purge()
+        return sum(super(TemplateStore, self).purge(k) for k, _, _ in self.scan() if self.derived_from(k, key))
+
+    def _normalize(self, key, src, name, progress_cb=None):
+        part = self.part_path(key)
+        run_cmd([
+            "ffmpeg", "-y", "-i", str(src),
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", fit_filter(), *NORMALIZE_ARGS,
+            "-movflags", "+faststart", str(part)
+        ], f"normalize template {name or key}", progress_cb, progress_cb and probe_duration(src))
+        return self.commit(part, key, name=name, source_bytes=os.path.getsize(src))
+
+    def loop(self, path, min_seconds):
+        """Return a keyframe-dense, video-only loop of a normalized template.
+
+        Loops are encoded once with NORMALIZE_VIDEO_ARGS and stored next to the
+        template, doubling in length from LOOP_SECONDS until they cover
+        min_seconds.
+        """
+        seconds = LOOP_SECONDS
+        while seconds < min_seconds:
+            seconds *= 2
+        key = f"{Path(path).stem}-loop{seconds}"
+        with self.key_lock(key):
+            cached = self.get(key)
+            if cached:
+                return cached
+            part = self.part_path(key)
+            run_cmd([
+                "ffmpeg", "-y", "-stream_loop", "-1", "-i", path,
+                "-map", "0:v:0", "-t", str(seconds), *NORMALIZE_VIDEO_ARGS,
+                "-movflags", "+faststart", str(part)
+            ], f"loop template {key}")
+            name = self._read_meta(Path(path).stem).get("name", "")
+            return self.commit(part, key, name=f"{name} (loop {seconds}s)")
+
+    def proxy(self, path, profile):
+        """Return a normalized template scaled down to a render profile's canvas.
+
+        Previews decode these instead of the 1080p templates, which is most
+        of a low-res render's cost; they are encoded once per template.
+        """
+        key = f"{Path(path).stem}-{profile}"
+        out = RENDER_PROFILES[profile]
+        with self.key_lock(key):
+            cached = self.get(key)
+            if cached:
+                return cached
+            part = self.part_path(key)
+            run_cmd([
+                "ffmpeg", "-y", "-i", path,
+                "-map", "0:v:0", "-map", "0:a:0?",
+                "-vf", fit_filter(out["width"], out["height"], out["fps"]),
+                "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode", "-crf", "23", "-pix_fmt", "yuv420p",
+                "-c:a", "copy", "-movflags", "+faststart", str(part)
+            ], f"{profile} proxy {key}")
+            name = self._read_meta(Path(path).stem).get("name", "")
+            return self.commit(part, key, name=f"{name} ({profile})")
+
+class TTSCache(DiskCache):
+    """Synthesized line audio, keyed by (normalized text, voice, TTS_MODEL, TTS_PROMPT)."""
+
+    suffix = ".wav"
+
+    def __init__(self, root, max_bytes):
+        super().__init__(root, max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, text, voice):
+        text = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(json.dumps([text, voice, TTS_MODEL, TTS_PROMPT]).encode()).hexdigest()[:32]
+
+    def load(self, key):
+        """A cached line's raw PCM, or None on a miss."""
+        cached = self.get(key)
+        with self._lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not cached:
+            return None
+        try:
+            with wave.open(cached, "rb") as wf:
+                return wf.readframes(wf.getnframes())
+        except FileNotFoundError:
+            # evicted by another session between get() and the read
+            return None
+
+    def put(self, key, pcm, name=""):
+        part = self.part_path(key)
+        write_wav(str(part), pcm)
+        return self.commit(part, key, name=name)
+
+@st.cache_resource
+def get_template_store():
+    return TemplateStore(CACHE_DIR / "templates", TEMPLATE_CACHE_MB * 1024 * 1024)
+
+@st.cache_resource(max_entries=32, show_spinner=False, validate=lambda key: get_template_store().available(key))
+def stage_upload(file_id, size, _upload):
+    """Stage an uploaded template once per upload; reruns and repeat clicks reuse the key."""
+    return get_template_store().stage(_upload.getbuffer(), _upload.name)
+
+@st.cache_resource
+def get_tts_cache():
+    return TTSCache(CACHE_DIR / "tts", TTS_CACHE_MB * 1024 * 1024)
+
+class SegmentCache(DiskCache):
+    """Encoded video pieces for the incremental engine.
+
+    A piece is a template played from its first frame for a whole number of
+    frames, so it is keyed by (template key, frame count, encode args); the
+    line's text, voice and audio don't change its pixels.
+    """
+
+    suffix = ".mp4"
+
+    def key_for(self, template, frames, args):
+        return hashlib.sha256(json.dumps([Path(template).stem, frames, RENDER_FPS, args]).encode()).hexdigest()[:32]
+
+@st.cache_resource
+def get_segment_cache():
+    return SegmentCache(CACHE_DIR / "segments", SEGMENT_CACHE_MB * 1024 * 1024)
+
+class OutputStore(DiskCache):
+    """Finished videos, keyed by job ID.
+
+    On top of the size cap, entries not watched or downloaded for max_age
+    seconds are dropped whenever a new video is added.
+    """
+
+    suffix = ".mp4"
+
+    def __init__(self, root, max_bytes, max_age):
+        super().__init__(root, max_bytes)
+        self.max_age = max_age
+
+    def commit(self, part, key, **meta):
+        self.expire()
+        return super().commit(part, key, **meta)
+
+    def expire(self):
+        cutoff = time.time() - self.max_age
+        return sum(self.purge(key) for key, _, last_used in self.scan() if last_used < cutoff)
+
+@st.cache_resource
+def get_output_store():
+    return OutputStore(CACHE_DIR / "outputs", OUTPUT_STORE_MB * 1024 * 1024, JOB_RETENTION_HOURS * 3600)
+
+# ============================================================================
+# MEDIA SERVER
+# ============================================================================
+MEDIA_NAME = re.compile(r"[\w-]+\.mp4")
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serve output store videos with HTTP range support, straight from disk.
+
+    Players fetch what they need with Range requests and bytes go out with
+    sendfile, so nothing is held in memory however long the video is.
+    ?download=1 adds a Content-Disposition so browsers save instead of play.
+    """
+
+    store = None
+
+    def do_GET(self):
+        self.send_media(body=True)
+
+    def do_HEAD(self):
+        self.send_media(body=False)
+
+    def send_media(self, body):
+        url = urlparse(self.path)
+        name = unquote(url.path).rsplit("/", 1)[-1]
+        path = self.store.root / name
+        if not MEDIA_NAME.fullmatch(name) or not path.is_file():
+            self.send_error(404)
+            return
+        self.store.get(name[:-len(self.store.suffix)])
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", "").strip())
+        if match and (match[1] or match[2]):
+            if match[1]:
+                start = int(match[1])
+                end = min(int(match[2]), size - 1) if match[2] else size - 1
+            else:
+                start = max(0, size - int(match[2]))
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if "download" in parse_qs(url.query):
+            self.send_header("Content-Disposition", 'attachment; filename="pawdcast.mp4"')
+        self.end_headers()
+        if body:
+            try:
+                with open(path, "rb") as f:
+                    self.request.sendfile(f, start, end - start + 1)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the player seeked elsewhere and dropped this request
+
+    def log_message(self, fmt, *args):
+        pass
+
+class MediaServer:
+    """Background HTTP server for the output store; url_for() gives the link for a job's video.
+
+    It has no auth and its URLs are guessable job IDs, so it only runs when
+    PAWDCAST_MEDIA_URL puts it behind a deliberately configured public URL.
+    """
+
+    def __init__(self, store, host=MEDIA_HOST, port=MEDIA_PORT, base_url=MEDIA_BASE_URL):
+        handler = type("BoundMediaHandler", (MediaHandler,), {"store": store})
+        try:
+            self.httpd = ThreadingHTTPServer((host, port), handler)
+        except OSError:
+            if base_url:
+                raise
+            # port taken (another app process?); any free port works when the URL isn't pinned
+            self.httpd = ThreadingHTTPServer((host, 0), handler)
+        self.httpd.daemon_threads = True
+        self.base_url = (base_url or f"http://localhost:{self.httpd.server_address[1]}").rstrip("/")
+        threading.Thread(target=self.httpd.serve_forever, name="media-server", daemon=True).start()
+
+    def url_for(self, key, download=False):
+        return f"{self.base_url}/{key}.mp4" + ("?download=1" if download else "")
+
+@st.cache_resource
+def get_media_server():
+    """The range-serving media server, or None when no PAWDCAST_MEDIA_URL is set."""
+    return MediaServer(get_output_store()) if MEDIA_BASE_URL else None
+
+class StaticMedia(DiskCache):
+    """Links to finished videos under static/media, played through Streamlit's static route.
+
+    That route streams files from disk with range support, so a video is
+    never loaded into memory. Names are keyed hashes of the output key, so a
+    link can't be guessed from a job ID; the key is per process, and links
+    left by an earlier process are cleared at startup.
+    """
+
+    suffix = ".mp4"
+
+    def __init__(self, root, max_bytes):
+        super().__init__(root, max_bytes)
+        self.secret = secrets.token_bytes(32)
+        self.purge()
+
+    def url_for(self, store, key):
+        """Static URL of an output store video, or None if it is gone or too big to serve."""
+        src = store.get(key)
+        if not src or os.path.getsize(src) > STATIC_FILE_MAX_BYTES:
+            return None
+        name = hmac.new(self.secret, key.encode(), "sha256").hexdigest()[:32]
+        with self.key_lock(name):
+            if not self.get(name):
+                part = self.part_path(name)
+                try:
+                    os.link(src, part)
+                except OSError:
+                    # output store on another filesystem
+                    shutil.copyfile(src, part)
+                self.commit(part, name)
+        return f"/app/static/{self.root.name}/{name}{self.suffix}"
+
+@st.cache_resource
+def get_static_media():
+    """Video links served by Streamlit, or None when static serving is off."""
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    return StaticMedia(STATIC_MEDIA_DIR, STATIC_MEDIA_MB * 1024 * 1024)
+
+# ============================================================================
+# CAPTIONS
+# ============================================================================
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,{font},{size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,-1,0,0,0,100,100,0,0,1,5,0,2,90,90,80,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+# braces open override tags and backslashes escapes, so neither may reach libass
+ASS_TEXT = str.maketrans({"{": "(", "}": ")", "\\": "/"})
+
+def caption_chunks(text, max_chars=CAPTION_MAX_CHARS):
+    """Split a line at word boundaries into chunks of at most max_chars."""
+    chunks, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            chunks.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".lstrip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+def caption_events(segments):
+    """Return (start, end, text) for every caption chunk on the output timeline.
+
+    A line's time is shared among its chunks in proportion to their length,
+    which tracks how long each part takes to say.
+    """
+    events = []
+    for (start, duration), seg in zip(segment_timeline(segments), segments):
+        chunks = caption_chunks(seg.get('text', ''))
+        chars = sum(len(c) for c in chunks)
+        for c in chunks:
+            end = start + duration * len(c) / chars
+            events.append((start, end, c))
+            start = end
+    return events
+
+def ass_time(seconds):
+    cs = round(seconds * 100)
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+def write_captions(segments, path, width=RENDER_WIDTH, height=RENDER_HEIGHT):
+    """Write the skit's captions as an ASS script for a width x height frame; returns path.
+
+    libass wraps lines that don't fit, so narrow formats get more rows.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(ASS_HEADER.format(width=width, height=height, font=CAPTION_FONT, size=CAPTION_SIZE))
+        for start, end, text in caption_events(segments):
+            f.write(f"Dialogue: 0,{ass_time(start)},{ass_time(end)},Default,,0,0,0,,{text.translate(ASS_TEXT)}\n")
+    return str(path)
+
+def caption_filter(path):
+    """ass filter that burns a caption script in (path escaped for a filtergraph)."""
+    path = str(path).replace("\\", "/").replace(":", "\\:")
+    return f"ass=filename='{path}'"
+
+def soft_caption_args(path, index):
+    """Input and output args that mux a caption script as a mov_text track (input `index`)."""
+    if not path:
+        return [], []
+    return ["-i", path], ["-map", f"{index}:s", "-c:s", "mov_text", "-metadata:s:s:0", "language=eng"]
+
 # ============================================================================
 # VIDEO CREATION
 # ============================================================================
-def create_video_from_segments(segments, tmpl1, tmpl2, closing, output, progress_cb=None):
-    temp = Path(output).parent
+def fit_filter(width=RENDER_WIDTH, height=RENDER_HEIGHT, fps=RENDER_FPS):
+    """Scale/pad any template onto the output canvas."""
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps}")
+
+def format_size(name, profile="publish"):
+    """Frame size of an output format, scaled down with the profile (even numbers for yuv420p)."""
+    fmt = OUTPUT_FORMATS[name]
+    scale = RENDER_PROFILES[profile]["width"] / RENDER_WIDTH
+    return 2 * round(fmt["width"] * scale / 2), 2 * round(fmt["height"] * scale / 2)
+
+def format_fit_filter(name, profile="publish"):
+    """Fit any template straight into an output format's frame (see fit_filter)."""
+    width, height = format_size(name, profile)
+    fps = RENDER_PROFILES[profile]["fps"]
+    if OUTPUT_FORMATS[name]["fit"] == "crop":
+        return f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1,fps={fps}"
+    return fit_filter(width, height, fps)
+
+def tee_outputs(paths, streams):
+    """-f tee target writing the mapped streams to several MP4s from one set of encodes.
+
+    paths are listed in -map order of their video streams; streams are the
+    other stream specifiers every file gets (e.g. "a", "s").
+    """
+    slaves = []
+    for i, path in enumerate(paths):
+        select = ",".join([f"v:{i}", *streams])
+        path = re.sub(r"([\\|'\[\]])", r"\\\1", str(path))
+        slaves.append(f"[f=mp4:movflags=+faststart:select=\\'{select}\\']{path}")
+    return ["-flags", "+global_header", "-f", "tee", "|".join(slaves)]
+
+def segment_timeline(segments):
+    """Return (start, duration) of each segment on the output timeline."""
+    timeline = []
+    t = 0.0
+    for seg in segments:
+        timeline.append((t, seg['duration']))
+        t += seg['duration']
+    return timeline
+
+def segment_frames(segments, cumulative=True):
+    """Frame count of each segment, with cuts snapped to the nearest whole frame.
+
+    cumulative snaps each cut's position on the timeline, so rounding never
+    drifts from a continuous track; otherwise every segment is rounded on its
+    own, so one segment's length doesn't move the frame counts of the rest.
+    """
+    if not cumulative:
+        return [max(1, round(seg['duration'] * RENDER_FPS)) for seg in segments]
+    timeline = segment_timeline(segments)
+    total = sum(d for _, d in timeline)
+    bounds = [round(s * RENDER_FPS) for s, _ in timeline] + [round(total * RENDER_FPS)]
+    return [max(1, bounds[i + 1] - bounds[i]) for i in range(len(segments))]
+
+def audio_input(audio):
+    """ffmpeg input args for a continuous track: a file, or in-memory PCM on stdin."""
+    if isinstance(audio, np.ndarray):
+        return ["-f", "s16le", "-ar", str(TTS_SAMPLE_RATE), "-ac", "1", "-i", "pipe:0"]
+    return ["-i", audio]
+
+def audio_stdin(audio):
+    """What run_cmd must feed on stdin for audio_input(audio)."""
+    return audio if isinstance(audio, np.ndarray) else None
+
+def build_speech_audio(segments, first_index, audio=None, durations=None):
+    """Input args and filter chains that produce [speech], the dialogue track.
+
+    With `audio` (an Audio Mode upload, or a dialogue_track in memory), the
+    one continuous track is used over the whole timeline and encoded once.
+    Otherwise each segment's own file is trimmed/padded to its duration and
+    concatenated.
+    """
+    durations = durations or [seg['duration'] for seg in segments]
+    if audio is not None:
+        total = sum(durations)
+        return audio_input(audio), [f"[{first_index}:a]atrim=duration={total:.6f},{AUDIO_NORMALIZE},apad=whole_dur={total:.6f}[speech]"]
+    inputs, chains = [], []
+    for i, (seg, d) in enumerate(zip(segments, durations)):
+        inputs += ["-i", seg['audio']]
+        chains.append(f"[{first_index + i}:a]atrim=duration={d:.6f},{AUDIO_NORMALIZE},apad=whole_dur={d:.6f}[a{i}]")
+    chains.append(f"{''.join(f'[a{i}]' for i in range(len(segments)))}concat=n={len(segments)}:v=0:a=1[speech]")
+    return inputs, chains
+
+def build_render_graph(segments, tmpl1, tmpl2, closing, normalized=False, audio=None, profile="publish", captions=None,
+                       formats=None):
+    """Build ffmpeg input args and one filter_complex for the whole video.
+
+    Both speaker templates loop for the full dialogue length and speaker 2 is
+    overlaid on speaker 1 whenever it is talking, so switching happens by
+    timestamp instead of by cutting files. The speech track (see
+    build_speech_audio) and the outro with its own audio are added in the
+    same graph. Templates that
+    came out of the TemplateStore (or its proxies) are already on the
+    profile's canvas, so normalized skips the scale/pad work. A `captions`
+    script is burned into the dialogue part in the same pass.
+
+    With formats (OUTPUT_FORMATS names), each template is decoded once and
+    split, and every format is fit from the template's own frames: the graph
+    ends in [v_<name>] per format and one [a], and captions maps each format
+    to its script.
+    """
+    out = RENDER_PROFILES[profile]
+    timeline = segment_timeline(segments)
+    total = sum(d for _, d in timeline)
+    inputs = []
+    # (format, label suffix, fit filter) for each video the graph produces
+    if formats:
+        outs = [(n, f"_{n}", format_fit_filter(n, profile)) for n in formats]
+    else:
+        outs = [(None, "", "null" if normalized else fit_filter(out["width"], out["height"], out["fps"]))]
+
+    def add_input(path, loop=False):
+        inputs.extend((["-stream_loop", "-1"] if loop else []) + ["-i", path])
+        return inputs.count("-i") - 1
+
+    def fan_out(idx, label):
+        """One fitted copy of input idx's video per output: [<label><suffix>] (trimmed when looped)."""
+        srcs = [f"[{idx}:v]"]
+        if len(outs) > 1:
+            chains.append(f"[{idx}:v]split={len(outs)}{''.join(f'[{label}src{x}]' for _, x, _ in outs)}")
+            srcs = [f"[{label}src{x}]" for _, x, _ in outs]
+        trim = f",trim=duration={total:.3f},setpts=PTS-STARTPTS" if label != "cv" else ""
+        for src, (_, x, fit) in zip(srcs, outs):
+            chains.append(f"{src}{fit}{trim}[{label}{x}]")
+
+    spk1 = [(s, s + d) for (s, d), seg in zip(timeline, segments) if "1" in seg['speaker']]
+    spk2 = [(s, s + d) for (s, d), seg in zip(timeline, segments) if "1" not in seg['speaker']]
+
+    chains = []
+    for label, path, spans in (("s1", tmpl1, spk1), ("s2", tmpl2, spk2)):
+        if spans:
+            fan_out(add_input(path, loop=True), label)
+
+    mains = []
+    for name, x, _ in outs:
+        if spk1 and spk2:
+            enable = "+".join(f"gte(t,{s:.3f})*lt(t,{e:.3f})" for s, e in spk2)
+            chains.append(f"[s1{x}][s2{x}]overlay=enable='{enable}':shortest=1[main{x}]")
+            main_label = f"main{x}"
+        else:
+            main_label = f"s1{x}" if spk1 else f"s2{x}"
+        script = captions[name] if formats and captions else captions
+        if script:
+            chains.append(f"[{main_label}]{caption_filter(script)}[captioned{x}]")
+            main_label = f"captioned{x}"
+        mains.append(main_label)
+
+    speech_inputs, speech_chains = build_speech_audio(segments, inputs.count("-i"), audio)
+    inputs.extend(speech_inputs)
+    chains.extend(speech_chains)
+
+    idx = add_input(closing)
+    fan_out(idx, "cv")
+    chains.append(f"[{idx}:a]{AUDIO_NORMALIZE}[ca]")
+    if not formats:
+        chains.append(f"[{mains[0]}][speech][cv][ca]concat=n=2:v=1:a=1[v][a]")
+    else:
+        # the audio is joined (and later encoded) once for every format
+        for main_label, (_, x, _) in zip(mains, outs):
+            chains.append(f"[{main_label}][cv{x}]concat=n=2:v=1:a=0[v{x}]")
+        chains.append("[speech][ca]concat=n=2:v=0:a=1[a]")
+
+    return inputs, ";".join(chains)
+
+def encode_progress(progress_cb, lo, hi, msg):
+    """run_cmd progress callback that maps the encoded fraction onto [lo, hi]."""
+    if not progress_cb:
+        return None
+    return lambda f: progress_cb(lo + (hi - lo) * f, f"{msg} {f:.0%}")
+
+def render_single_pass(segments, tmpl1, tmpl2, closing, output, progress_cb=None, normalized=False, workers=1, audio=None,
+                       profile="publish", captions=None, soft_captions=None, formats=None):
+    """Render the whole video, outro included, with a single libx264 encode.
+
+    There is only one ffmpeg process, so workers is unused; x264 already
+    spreads that one encode across every core. formats maps output format
+    names to paths (output among them): the same process then fits and
+    encodes the video of every format (see build_render_graph), while the
+    audio is encoded once and the tee muxer writes it into every file.
+    captions then maps each format to its script.
+    """
+    out = RENDER_PROFILES[profile]
+    msg = "👀 Rendering preview..." if profile == "preview" else "🎬 Rendering video..."
+    if progress_cb: progress_cb(0.0, msg)
+
+    total = sum(seg['duration'] for seg in segments) + get_duration(closing)
+    inputs, graph = build_render_graph(segments, tmpl1, tmpl2, closing, normalized, audio, profile, captions,
+                                       list(formats) if formats else None)
+    sub_inputs, sub_args = soft_caption_args(soft_captions, inputs.count("-i"))
+    cmd = ["ffmpeg", "-y", *inputs, *sub_inputs, "-filter_complex", graph]
+    if formats:
+        cmd += [arg for n in formats for arg in ("-map", f"[v_{n}]")] + ["-map", "[a]"]
+    else:
+        cmd += ["-map", "[v]", "-map", "[a]"]
+    cmd += [
+        *sub_args, "-r", str(out["fps"]),
+        "-c:v", "libx264", *out["video_args"], "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", out["audio_bitrate"],
+    ]
+    if formats:
+        cmd += tee_outputs(formats.values(), ["a", "s"] if sub_args else ["a"])
+    else:
+        cmd += ["-movflags", "+faststart", output]
+    run_cmd(cmd, f"single-pass {profile} render", encode_progress(progress_cb, 0.0, 1.0, msg), total, audio_stdin(audio))
+
+    if progress_cb: progress_cb(1.0, "✅ Done!")
+
+def render_legacy(segments, tmpl1, tmpl2, closing, output, progress_cb=None, normalized=False, workers=1, audio=None,
+                  captions=None, soft_captions=None):
+    """Render each line separately, then concat and append the outro (3 encodes).
+
+    Lines are rendered on up to `workers` ffmpeg processes at once, each
+    capped to its share of the cores, and muxed with their audio in the same
+    run. A continuous `audio` file is cut into per-line files first, as this
+    path always did; an in-memory track is sliced and piped to each line's
+    run instead. Templates loop at the demuxer (-stream_loop) rather than
+    through the loop filter, which holds every decoded frame in memory.
+
+    Each line's piece is named after its template, length and audio content
+    and lands atomically, so re-running in the same folder (a resumed job)
+    only renders the lines that aren't there yet.
+    """
+    temp = Path(output).resolve().parent
+    if isinstance(audio, np.ndarray):
+        bounds = [round(s * TTS_SAMPLE_RATE) for s, _ in segment_timeline(segments)] + [len(audio)]
+        segments = [{**seg, "audio": audio[a:b]} for seg, a, b in zip(segments, bounds, bounds[1:])]
+    elif audio:
+        timeline = segment_timeline(segments)
+        split_files = split_audio_file(audio, [s for s, _ in timeline[1:]], sum(d for _, d in timeline), str(temp))
+        segments = [{**seg, "audio": f["path"]} for seg, f in zip(segments, split_files)]
+    fit = "" if normalized else "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2,"
+    threads = ffmpeg_threads(workers)
     
-    if progress_cb: progress_cb(0.4, "🎬 Building video segments...")
+    def piece_path(i, seg):
+        template = tmpl1 if "1" in seg['speaker'] else tmpl2
+        sound = seg['audio']
+        sound = hashlib.sha256(memoryview(sound).cast("B")).hexdigest() if isinstance(sound, np.ndarray) else file_digest(sound)
+        key = hashlib.sha256(json.dumps([file_digest(template), seg['duration'], fit, sound]).encode()).hexdigest()[:16]
+        return temp / f"seg_{i}-{key}.mp4"
+    
+    pieces = [piece_path(i, seg) for i, seg in enumerate(segments)]
+    reused = sum(p.exists() for p in pieces)
+    if progress_cb: progress_cb(0.4, f"♻️ Reusing {reused} of {len(pieces)} rendered lines..." if reused
+                                else "🎬 Building video segments...")
     
-    segment_videos = []
-    for i, seg in enumerate(segments):
-        seg_out = str(temp / f"seg_{i}.mp4")
+    def render_segment(i, seg):
+        seg_out = pieces[i]
+        if seg_out.exists():
+            return str(seg_out)
+        part = temp / f".{seg_out.name}.part.mp4"
         template = tmpl1 if "1" in seg['speaker'] else tmpl2
         duration = seg['duration']
         
         run_cmd([
-            "ffmpeg", "-y", "-i", template,
+            "ffmpeg", "-y", "-stream_loop", "-1", "-i", template, *audio_input(seg['audio']),
             "-filter_complex",
-            f"[0:v]scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2,loop=loop=-1:size=32767,trim=duration={duration},setpts=PTS-STARTPTS[outv]",
-            "-map", "[outv]", "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28",
-            "-t", str(duration), "-an", seg_out
-        ], f"video segment {i}")
-        
-        seg_with_audio = str(temp / f"seg_audio_{i}.mp4")
-        run_cmd([
-            "ffmpeg", "-y", "-i", seg_out, "-i", seg['audio'],
-            "-c:v", "copy", "-c:a", "aac", "-b:a", "192k", "-shortest", seg_with_audio
-        ], f"add audio {i}")
-        segment_videos.append(seg_with_audio)
+            f"[0:v]{fit}trim=duration={duration},setpts=PTS-STARTPTS[outv]",
+            "-map", "[outv]", "-map", "1:a:0", "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28",
+            "-threads", threads, "-t", str(duration),
+            "-c:a", "aac", "-b:a", "192k", "-shortest", str(part)
+        ], f"segment {i}", stdin=audio_stdin(seg['audio']))
+        os.replace(part, seg_out)
+        return str(seg_out)
+    
+    segment_videos = run_parallel(render_segment, segments, workers, progress_cb, (0.4, 0.7), "🎬 Rendered segment")
     
     if progress_cb: progress_cb(0.7, "🔗 Joining segments...")
     
@@ -381,47 +1457,377 @@ def create_video_from_segments(segments, tmpl1, tmpl2, closing, output, progress
             f.write(f"file '{v}'\n")
     
     main_video = str(temp / "main.mp4")
-    run_cmd(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c:v", "libx264", "-preset", "fast", "-crf", "23", main_video], "concat")
+    total = sum(seg['duration'] for seg in segments)
+    run_cmd(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list), "-c:v", "libx264", "-preset", "fast", "-crf", "23", main_video],
+            "concat", encode_progress(progress_cb, 0.7, 0.85, "🔗 Joining segments..."), total)
     
     if progress_cb: progress_cb(0.85, "🎵 Adding outro with audio...")
     
-    # Keep closing video's original audio
+    # Keep closing video's original audio; captions go on in this last encode
+    main_v = f"[0:v]{caption_filter(captions)}[mv];[mv]" if captions else "[0:v]"
+    sub_inputs, sub_args = soft_caption_args(soft_captions, 2)
     run_cmd([
         "ffmpeg", "-y",
         "-i", main_video,
-        "-i", closing,
-        "-filter_complex", "[0:v][0:a][1:v][1:a]concat=n=2:v=1:a=1[v][a]",
-        "-map", "[v]", "-map", "[a]",
+        "-i", closing, *sub_inputs,
+        "-filter_complex", f"{main_v}[0:a][1:v][1:a]concat=n=2:v=1:a=1[v][a]",
+        "-map", "[v]", "-map", "[a]", *sub_args,
         "-c:v", "libx264",
         "-c:a", "aac",
         "-preset", "fast",
         "-crf", "23",
         "-movflags", "+faststart",
         output
-    ], "final with closing audio preserved")
+    ], "final with closing audio preserved", encode_progress(progress_cb, 0.85, 1.0, "🎵 Adding outro with audio..."),
+        total + get_duration(closing))
     
     if progress_cb: progress_cb(1.0, "✅ Done!")
 
+def render_stream_copy(segments, tmpl1, tmpl2, closing, output, progress_cb=None, normalized=False, workers=1, audio=None,
+                       soft_captions=None):
+    """Assemble the video from pre-encoded template loops without re-encoding it.
+
+    Every line starts at frame 0 of its speaker's loop, so each cut is a
+    keyframe-aligned concat-demuxer outpoint and no boundary needs encoding.
+    Cuts are snapped to whole frames and the line audio is trimmed/padded to
+    the same length, then encoded once together with the outro audio. With no
+    video encode, captions can only be muxed as a subtitle track.
+    """
+    store = get_template_store()
+    if not normalized:
+        tmpl1, tmpl2, closing = [store.add_file(p) for p in (tmpl1, tmpl2, closing)]
+    temp = Path(output).resolve().parent
+
+    if progress_cb: progress_cb(0.4, "🔁 Preparing template loops...")
+
+    longest = max(seg['duration'] for seg in segments)
+    templates = list(dict.fromkeys(tmpl1 if "1" in seg['speaker'] else tmpl2 for seg in segments))
+    loops = dict(zip(templates, run_parallel(lambda i, t: store.loop(t, longest), templates, workers)))
+
+    if progress_cb: progress_cb(0.6, "✂️ Cutting segments...")
+
+    total = sum(seg['duration'] for seg in segments)
+    concat_list = temp / "concat.txt"
+    durations = []
+    with open(concat_list, "w") as f:
+        for seg, frames in zip(segments, segment_frames(segments)):
+            durations.append(frames / RENDER_FPS)
+            loop = loops[tmpl1 if "1" in seg['speaker'] else tmpl2]
+            # -bf 0 keeps dts == pts, so half a frame before the next one is a clean cut
+            f.write(f"file '{loop}'\noutpoint {(frames - 0.5) / RENDER_FPS:.6f}\nduration {durations[-1]:.6f}\n")
+        f.write(f"file '{closing}'\n")
+
+    audio_inputs, chains = build_speech_audio(segments, 1, audio, durations)
+    closing_idx = 1 + audio_inputs.count("-i")
+    chains.append(f"[{closing_idx}:a]{AUDIO_NORMALIZE}[ca]")
+    chains.append("[speech][ca]concat=n=2:v=0:a=1[a]")
+
+    sub_inputs, sub_args = soft_caption_args(soft_captions, closing_idx + 1)
+
+    if progress_cb: progress_cb(0.8, "🎵 Muxing audio...")
+
+    run_cmd([
+        "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list),
+        *audio_inputs, "-i", closing, *sub_inputs,
+        "-filter_complex", ";".join(chains),
+        "-map", "0:v:0", "-map", "[a]", *sub_args,
+        "-c:v", "copy", "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart",
+        output
+    ], "stream-copy assembly", encode_progress(progress_cb, 0.8, 1.0, "🎵 Muxing audio..."), total + get_duration(closing),
+        audio_stdin(audio))
+
+    if progress_cb: progress_cb(1.0, "✅ Done!")
+
+def render_incremental(segments, tmpl1, tmpl2, closing, output, progress_cb=None, normalized=False, workers=1, audio=None,
+                       soft_captions=None):
+    """Assemble the video from per-line pieces kept in the segment cache.
+
+    Each line is its speaker's template from frame 0, encoded once at publish
+    quality for its frame count (see SegmentCache); the outro is a piece too.
+    Re-rendering an edited skit only encodes the lines whose length or
+    speaker changed, then joins every piece by copy and encodes the audio once.
+    Like stream copy, it can only mux captions as a subtitle track.
+    """
+    store = get_template_store()
+    if not normalized:
+        tmpl1, tmpl2, closing = [store.add_file(p) for p in (tmpl1, tmpl2, closing)]
+    cache = get_segment_cache()
+    temp = Path(output).resolve().parent
+    args = ["-c:v", "libx264", *RENDER_PROFILES["publish"]["video_args"], "-pix_fmt", "yuv420p",
+            "-video_track_timescale", str(RENDER_FPS * 512)]
+    threads = ffmpeg_threads(workers)
+
+    # per-line audio is trimmed to each piece, so lines can be snapped independently
+    frames = segment_frames(segments, cumulative=audio is not None)
+    pieces = [(tmpl1 if "1" in seg['speaker'] else tmpl2, n) for seg, n in zip(segments, frames)]
+    pieces.append((closing, None))
+    keys = [cache.key_for(t, n, args) for t, n in pieces]
+    todo = list({k: p for k, p in zip(keys, pieces) if not cache.get(k)}.items())
+
+    if progress_cb: progress_cb(0.05, f"♻️ Reusing {len(set(keys)) - len(todo)} of {len(set(keys))} segments...")
+
+    def render_piece(i, item):
+        key, (template, n) = item
+        part = cache.part_path(key)
+        loop = ["-stream_loop", "-1"] if n else []
+        count = ["-frames:v", str(n)] if n else []
+        run_cmd([
+            "ffmpeg", "-y", *loop, "-i", template, "-map", "0:v:0", *count,
+            *args, "-threads", threads, "-movflags", "+faststart", str(part)
+        ], f"segment piece {i}")
+        return cache.commit(part, key, name=f"{Path(template).stem[:8]} · {n} frames" if n else "outro")
+
+    run_parallel(render_piece, todo, workers, progress_cb, (0.05, 0.8), "🎬 Rendered segment")
+    paths = [cache.get(k) for k in keys]
+    if None in paths:
+        raise Exception("Segment cache is too small to hold this video's pieces")
+
+    concat_list = temp / "concat.txt"
+    with open(concat_list, "w") as f:
+        for path in paths:
+            f.write(f"file '{path}'\n")
+
+    durations = [n / RENDER_FPS for n in frames]
+    audio_inputs, chains = build_speech_audio(segments, 1, audio, durations)
+    closing_idx = 1 + audio_inputs.count("-i")
+    chains.append(f"[{closing_idx}:a]{AUDIO_NORMALIZE}[ca]")
+    chains.append("[speech][ca]concat=n=2:v=0:a=1[a]")
+
+    sub_inputs, sub_args = soft_caption_args(soft_captions, closing_idx + 1)
+
+    if progress_cb: progress_cb(0.8, "🔗 Joining segments...")
+
+    run_cmd([
+        "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list),
+        *audio_inputs, "-i", closing, *sub_inputs,
+        "-filter_complex", ";".join(chains),
+        "-map", "0:v:0", "-map", "[a]", *sub_args,
+        "-c:v", "copy", "-c:a", "aac", "-b:a", RENDER_PROFILES["publish"]["audio_bitrate"],
+        "-movflags", "+faststart",
+        output
+    ], "incremental assembly", encode_progress(progress_cb, 0.8, 1.0, "🔗 Joining segments..."),
+        sum(durations) + get_duration(closing), audio_stdin(audio))
+
+    if progress_cb: progress_cb(1.0, "✅ Done!")
+
+RENDER_ENGINES = {
+    "single_pass": render_single_pass,
+    "stream_copy": render_stream_copy,
+    "incremental": render_incremental,
+    "legacy": render_legacy,
+}
+# Engines with a final video encode that captions can be burned into
+CAPTION_BURN_ENGINES = ("single_pass", "legacy")
+
+def create_video_from_segments(segments, tmpl1, tmpl2, closing, output, progress_cb=None,
+                               engine=RENDER_ENGINE, normalized=False, workers=RENDER_WORKERS, audio=None,
+                               preview=False, captions="off", formats=None):
+    """Render segments (speaker, duration and, unless `audio` is given, per-line audio) to output.
+
+    audio is a continuous track: a file, or int16 PCM from dialogue_track.
+    Segments that still carry their line's "pcm" are joined into one first.
+
+    preview renders a low-res, low-frame-rate draft with the single-pass
+    engine whatever `engine` is, from template proxies when the templates are
+    normalized; the segments can be reused as-is for the publish render.
+
+    Long-form episodes (more than LONGFORM_LINES lines) never use the
+    per-line engines, so the ffmpeg process count and peak memory stay flat
+    as lines are added.
+
+    captions (see CAPTION_MODES) come from each segment's text: "burn" draws
+    them in the engine's final encode, "soft" muxes a subtitle track and
+    "both" does both. Engines that never encode video, or an ffmpeg without
+    libass, get the subtitle track instead of burned-in captions.
+
+    formats lists OUTPUT_FORMATS names to publish; the first is written to
+    output and the rest next to it as <stem>-<name><suffix>. Anything beyond
+    plain 16:9 is rendered by single_pass in one ffmpeg run. Returns
+    {format name: path}.
+    """
+    if engine not in RENDER_ENGINES:
+        raise Exception(f"Unknown render engine: {engine}")
+    if engine in PER_LINE_ENGINES and len(segments) > LONGFORM_LINES:
+        if progress_cb: progress_cb(0.0, f"📼 {len(segments)} lines: rendering in one pass...")
+        engine = "single_pass"
+    if captions not in CAPTION_MODES:
+        raise Exception(f"Unknown caption mode: {captions}")
+    if audio is None and segments and "pcm" in segments[0]:
+        audio, segments = dialogue_track(segments)
+    formats = list(dict.fromkeys(formats or ["landscape"]))
+    unknown = [n for n in formats if n not in OUTPUT_FORMATS]
+    if unknown:
+        raise Exception(f"Unknown output format: {', '.join(unknown)}")
+    output = Path(output)
+    paths = {n: str(output if i == 0 else output.with_name(f"{output.stem}-{n}{output.suffix}"))
+             for i, n in enumerate(formats)}
+    multi = formats != ["landscape"]
+    if multi:
+        engine = "single_pass"
+    kwargs = {"formats": paths} if multi else {}
+    scripts = []
+    if captions != "off":
+        temp = output.resolve().parent
+        scripts.append(write_captions(segments, temp / f"{output.stem}.ass"))
+        burn = captions in ("burn", "both") and (preview or engine in CAPTION_BURN_ENGINES) and has_filter("ass")
+        if burn and multi:
+            for n in formats:
+                fmt = OUTPUT_FORMATS[n]
+                scripts.append(write_captions(segments, temp / f"{output.stem}-{n}.ass", fmt["width"], fmt["height"]))
+            kwargs["captions"] = dict(zip(formats, scripts[1:]))
+        elif burn:
+            kwargs["captions"] = scripts[0]
+        if captions in ("soft", "both") or not burn:
+            kwargs["soft_captions"] = scripts[0]
+    try:
+        if preview:
+            if normalized:
+                store = get_template_store()
+                tmpl1, tmpl2, closing = [store.proxy(p, "preview") for p in (tmpl1, tmpl2, closing)]
+            render_single_pass(segments, tmpl1, tmpl2, closing, str(output), progress_cb,
+                               normalized=normalized, audio=audio, profile="preview", **kwargs)
+        else:
+            RENDER_ENGINES[engine](segments, tmpl1, tmpl2, closing, str(output), progress_cb,
+                                   normalized=normalized, workers=workers, audio=audio, **kwargs)
+        return paths
+    finally:
+        for script in scripts:
+            Path(script).unlink(missing_ok=True)
+
 # ============================================================================
 # GEMINI TTS
 # ============================================================================
-def generate_audio_gemini(text, voice, api_key, output_path):
-    """Generate TTS audio using Gemini."""
-    genai.configure(api_key=api_key)
-    
-    model = genai.GenerativeModel(TTS_MODEL)
-    
-    response = model.generate_content(
-        f'Say this naturally: "{text}"',
-        generation_config=genai.types.GenerationConfig(
-            response_mime_type="audio/wav",
-        )
-    )
-    
-    # Handle audio response
-    if hasattr(response, 'candidates') and response.candidates:
+class LatencyHistogram:
+    """Request latencies (seconds) counted into LATENCY_BUCKETS upper bounds."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf past the last bucket)."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_s": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["inf"], self.counts)),
+        }
+
+API_MODEL = re.compile(r"/models/([^/:]+)")
+
+class GeminiClients:
+    """One google-genai client per API key, all on one pooled keep-alive httpx client.
+
+    Every request is timed from httpcore's trace events into a histogram per
+    (model, phase):
+        connect   TCP + TLS setup, only for requests that opened a connection
+        wait      request sent -> response headers: the model's work plus a round trip
+        download  response body, which for a stream is the whole generation
+        total     the request end to end
+    so slow synthesis and a slow network show up separately.
+    """
+    PHASES = ("total", "connect", "wait", "download")
+
+    def __init__(self, base_url=GEMINI_BASE_URL, max_connections=API_CONNECTIONS):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.http = None
+        self._clients = {}
+        self._histograms = collections.defaultdict(LatencyHistogram)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def get(self, api_key):
+        from google import genai
+        from google.genai import types
+        with self._lock:
+            if self.http is None:
+                import httpx
+                self.http = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections,
+                                        keepalive_expiry=API_KEEPALIVE_SECONDS),
+                    follow_redirects=True,
+                    event_hooks={"request": [self._trace]},
+                )
+            if api_key not in self._clients:
+                self._clients[api_key] = genai.Client(api_key=api_key, http_options=types.HttpOptions(
+                    base_url=self.base_url, httpx_client=self.http
+                ))
+            return self._clients[api_key]
+
+    def _trace(self, request):
+        match = API_MODEL.search(request.url.path)
+        model = match.group(1) if match else "other"
+        marks = {"start": time.perf_counter()}
+
+        def trace(event, info):
+            # events look like "connection.connect_tcp.started" / "http11.receive_response_body.complete"
+            marks[event.split(".", 1)[1]] = time.perf_counter()
+            if event.endswith("response_closed.complete"):
+                self._record(model, marks)
+
+        request.extensions["trace"] = trace
+
+    def _record(self, model, marks):
+        connect_end = marks.get("start_tls.complete", marks.get("connect_tcp.complete"))
+        phases = {
+            "total": marks["response_closed.complete"] - marks["start"],
+            "wait": marks.get("receive_response_headers.complete", 0) - marks.get("send_request_body.complete", 0),
+            "download": marks.get("receive_response_body.complete", 0) - marks.get("receive_response_body.started", 0),
+        }
+        if connect_end:
+            phases["connect"] = connect_end - marks["connect_tcp.started"]
+        with self._lock:
+            self.requests += 1
+            self.connections += "connect" in phases
+            for phase, seconds in phases.items():
+                self._histograms[model, phase].observe(max(0.0, seconds))
+
+    def stats(self):
+        """{"requests", "connections", "models": {model: {phase: histogram summary}}}."""
+        with self._lock:
+            models = collections.defaultdict(dict)
+            for (model, phase), h in sorted(self._histograms.items()):
+                models[model][phase] = h.summary()
+            return {"requests": self.requests, "connections": self.connections, "models": dict(models)}
+
+@st.cache_resource
+def get_gemini_clients():
+    return GeminiClients()
+
+def gemini_client(api_key):
+    """The shared google-genai client for api_key; GEMINI_BASE_URL points it at another endpoint (e.g. a local stub)."""
+    return get_gemini_clients().get(api_key)
+
+def voice_config(voice):
+    from google.genai import types
+    return types.VoiceConfig(prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice))
+
+def response_pcm(response):
+    """Raw 16-bit PCM from a TTS response."""
+    if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
         audio_part = response.candidates[0].content.parts[0]
-        if hasattr(audio_part, 'inline_data'):
+        if audio_part.inline_data and audio_part.inline_data.data:
             audio_data = audio_part.inline_data.data
             
             if isinstance(audio_data, str):
@@ -430,24 +1836,193 @@ def generate_audio_gemini(text, voice, api_key, output_path):
                     audio_data += '=' * (4 - missing_padding)
                 audio_data = base64.b64decode(audio_data)
             
-            # Write as WAV
-            with wave.open(output_path, "wb") as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(24000)
-                wf.writeframes(audio_data)
-            
-            return output_path
+            return audio_data
     
     raise Exception("No audio generated")
 
-def generate_skit(article, api_key):
-    """Generate podcast skit from article."""
-    genai.configure(api_key=api_key)
+def write_wav(path, pcm):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(TTS_SAMPLE_RATE)
+        wf.writeframes(pcm)
+
+def generate_audio_gemini(text, voice, api_key):
+    """Generate TTS audio using Gemini; returns raw PCM."""
+    from google.genai import types
+    client = gemini_client(api_key)
+    response = client.models.generate_content(
+        model=TTS_MODEL,
+        contents=TTS_PROMPT.format(text=text),
+        config=types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(voice_config=voice_config(voice)),
+        )
+    )
+    return response_pcm(response)
+
+def generate_dialogue_pcm(lines, voice1, voice2, api_key):
+    """Voice a whole skit with one multi-speaker TTS request; returns raw PCM."""
+    from google.genai import types
+    dialogue = "\n".join(f"{'Speaker 1' if '1' in spk else 'Speaker 2'}: {txt}" for spk, txt in lines)
+    speakers = [
+        types.SpeakerVoiceConfig(speaker="Speaker 1", voice_config=voice_config(GEMINI_VOICES[voice1])),
+        types.SpeakerVoiceConfig(speaker="Speaker 2", voice_config=voice_config(GEMINI_VOICES[voice2])),
+    ]
+    client = gemini_client(api_key)
+    response = client.models.generate_content(
+        model=TTS_MODEL,
+        contents=DIALOGUE_PROMPT.format(dialogue=dialogue),
+        config=types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(speaker_voice_configs=speakers)
+            ),
+        )
+    )
+    return response_pcm(response)
+
+def align_dialogue_pcm(pcm, lines):
+    """Cut dialogue PCM into one piece per line at its most prominent pauses.
+
+    Returns None when the pieces don't plausibly match the text: every line
+    must last within ALIGN_RATIO of its share of the total by character count.
+    """
+    samples = np.frombuffer(pcm, dtype="<i2")
+    total = len(samples) / TTS_SAMPLE_RATE
+    splits = find_speech_boundaries(pcm_energy_db(samples, TTS_SAMPLE_RATE), len(lines))
+    if len(splits) != len(lines) - 1 or total <= 0:
+        return None
+    times = [0.0] + splits + [total]
+    durations = np.diff(times)
+    chars = np.array([max(1, len(txt)) for _, txt in lines], dtype=float)
+    ratio = durations / (total * chars / chars.sum())
+    if np.any(ratio < 1 / ALIGN_RATIO) or np.any(ratio > ALIGN_RATIO):
+        return None
+    bounds = [round(t * TTS_SAMPLE_RATE) for t in times]
+    return [samples[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+def is_retryable(exc):
+    """True for rate limiting (429) and server-side (5xx) API errors."""
+    code = getattr(exc, "code", None)
+    if not isinstance(code, int):
+        code = getattr(exc, "status_code", None)
+    return isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+def with_retry(fn, *args, retries=API_RETRIES, backoff=API_BACKOFF, **kwargs):
+    """Call fn, retrying retryable API errors with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(1.0, 1.5))
+
+def generate_audio_cached(text, voice, api_key):
+    """generate_audio_gemini behind the persistent TTS cache."""
+    cache = get_tts_cache()
+    key = cache.key_for(text, voice)
+    pcm = cache.load(key)
+    if pcm is not None:
+        return pcm
+    with span("gemini tts", cat="api"):
+        pcm = with_retry(generate_audio_gemini, text, voice, api_key)
+    cache.put(key, pcm, name=f"{voice}: {text[:40]}")
+    return pcm
+
+def synthesize_lines(lines, voice1, voice2, api_key, progress_cb=None, concurrency=TTS_CONCURRENCY):
+    """Generate TTS for parsed skit lines concurrently; segments come back in line order.
+
+    Each segment keeps its line's PCM in memory ("pcm", int16) and takes its
+    duration from the sample count; dialogue_track joins them. A resumed job
+    gets the lines it already voiced back from the TTS cache.
+    """
+    def synthesize(i, line):
+        spk, txt = line
+        voice = GEMINI_VOICES[voice1] if "1" in spk else GEMINI_VOICES[voice2]
+        pcm = np.frombuffer(generate_audio_cached(txt, voice, api_key), dtype="<i2")
+        return {
+            "speaker": spk,
+            "text": txt,
+            "pcm": pcm,
+            "duration": len(pcm) / TTS_SAMPLE_RATE
+        }
     
-    model = genai.GenerativeModel(SKIT_MODEL)
+    return run_parallel(synthesize, lines, concurrency, progress_cb, label="🎙️ Generated line")
+
+def synthesize_dialogue(lines, voice1, voice2, api_key, progress_cb=None, concurrency=TTS_CONCURRENCY):
+    """Like synthesize_lines, but with one multi-speaker request for the whole skit.
+
+    The returned audio is cut back into per-line segments; if it can't be
+    aligned with the lines, every line is voiced separately instead. The
+    aligned pieces go into the TTS cache, keyed by their line and the whole
+    dialogue (a line reads differently in another skit), so a resumed job
+    gets them back without a new request.
+    """
+    lines = list(lines)
+    if not lines:
+        return []
+    cache = get_tts_cache()
+    voices = [GEMINI_VOICES[voice1] if "1" in spk else GEMINI_VOICES[voice2] for spk, _ in lines]
+    dialogue = hashlib.sha256(json.dumps([lines, voices]).encode()).hexdigest()[:16]
+    keys = [cache.key_for(txt, f"{voice} in dialogue {dialogue}") for (_, txt), voice in zip(lines, voices)]
+    pieces = []
+    for key in keys:
+        pcm = cache.load(key)
+        if pcm is None:
+            break
+        pieces.append(np.frombuffer(pcm, dtype="<i2"))
+    if len(pieces) < len(lines):
+        if progress_cb: progress_cb(0.0, "🎙️ Generating dialogue audio...")
+        with span("gemini dialogue tts", cat="api"):
+            pcm = with_retry(generate_dialogue_pcm, lines, voice1, voice2, api_key)
+        pieces = align_dialogue_pcm(pcm, lines)
+        if pieces is None:
+            if progress_cb: progress_cb(0.0, "🎙️ Dialogue audio didn't line up, voicing line by line...")
+            return synthesize_lines(lines, voice1, voice2, api_key, progress_cb, concurrency)
+        for key, (_, txt), voice, piece in zip(keys, lines, voices, pieces):
+            cache.put(key, piece.tobytes(), name=f"{voice} (dialogue): {txt[:40]}")
     
-    prompt = f"""Transform this article into a short podcast conversation between two hosts.
+    segments = []
+    for (spk, txt), pcm in zip(lines, pieces):
+        segments.append({
+            "speaker": spk,
+            "text": txt,
+            "pcm": pcm,
+            "duration": len(pcm) / TTS_SAMPLE_RATE
+        })
+    if progress_cb: progress_cb(1.0, f"🎙️ Generated line {len(lines)}/{len(lines)}")
+    return segments
+
+def dialogue_track(segments, gap=LINE_GAP_SECONDS, fade=LINE_FADE_SECONDS):
+    """Join voiced segments' in-memory PCM into one dialogue track.
+
+    Every line gets `fade`-second ramps at its edges, so no cut clicks, and
+    `gap` seconds of silence before the next line, then is padded to a whole
+    number of video frames, so each speaker change lands exactly on a frame.
+    Returns the int16 track and the segments timed on it, without their PCM.
+    """
+    ramp = int(fade * TTS_SAMPLE_RATE)
+    gap = round(gap * TTS_SAMPLE_RATE)
+    lengths = [math.ceil((len(seg["pcm"]) + (gap if i < len(segments) - 1 else 0)) * RENDER_FPS / TTS_SAMPLE_RATE)
+               * TTS_SAMPLE_RATE // RENDER_FPS for i, seg in enumerate(segments)]
+    track = np.zeros(sum(lengths), dtype="<i2")
+    edge = np.linspace(0.0, 1.0, ramp, endpoint=False)
+    timed = []
+    pos = 0
+    for seg, length in zip(segments, lengths):
+        pcm = seg["pcm"]
+        line = track[pos:pos + len(pcm)]
+        line[:] = pcm
+        if ramp and len(pcm) > 2 * ramp:
+            line[:ramp] = line[:ramp] * edge
+            line[-ramp:] = line[-ramp:] * edge[::-1]
+        timed.append({**{k: v for k, v in seg.items() if k != "pcm"}, "duration": length / TTS_SAMPLE_RATE})
+        pos += length
+    return track, timed
+
+SKIT_PROMPT = """Transform this article into a short podcast conversation between two hosts.
 
 Rules:
 - 4-6 exchanges total
@@ -459,14 +2034,461 @@ Article:
 {article}
 
 Write the skit:"""
+
+def generate_skit_stream(article, api_key):
+    """Yield the skit text in chunks as SKIT_MODEL writes it."""
+    client = gemini_client(api_key)
+    
+    def open_stream():
+        # the request is only sent once the stream is read, so retry up to the first chunk
+        stream = iter(client.models.generate_content_stream(model=SKIT_MODEL, contents=SKIT_PROMPT.format(article=article)))
+        return stream, next(stream, None)
     
-    response = model.generate_content(prompt)
-    return response.text
+    stream, first = with_retry(open_stream)
+    if first is None:
+        return
+    for chunk in itertools.chain([first], stream):
+        if chunk.text:
+            yield chunk.text
+
+def generate_skit(article, api_key):
+    """Generate podcast skit from article."""
+    return "".join(generate_skit_stream(article, api_key))
+
+def stream_skit_lines(article, api_key):
+    """Yield parsed (speaker, text) lines while the skit is still being written."""
+    parser = SkitStreamParser()
+    for chunk in generate_skit_stream(article, api_key):
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+# ============================================================================
+# RENDER JOBS
+# ============================================================================
+class RenderJob:
+    """A render persisted under JOBS_DIR/<id>, so it can be polled, reattached and resumed.
+
+    params.json holds the inputs and state.json the status; each finished step
+    leaves a checkpoint that a resumed job picks up instead of redoing it:
+    skit.json, then segments.json with dialogue.wav once every line is voiced.
+    Lines voiced before a job stopped mid-TTS are only kept in the LRU TTS
+    cache (one by one, or as the aligned pieces of a whole-dialogue
+    request), so a resume after they were evicted voices them again. Within the
+    render step, the legacy engine's per-line pieces (seg_<i>-<key>.mp4 in
+    the job folder) and the incremental engine's segment cache carry over to
+    a resume; single-pass and stream-copy renders have no per-line pieces and
+    start that step over. Templates
+    are referenced by their TemplateStore key. The finished video goes to the
+    output store under the job ID, and the inputs and dialogue audio are
+    dropped once it is there.
+
+    A preview job stops at a low-res draft (stored as <id>-preview) and keeps
+    its inputs; publishing it re-runs only the render step on the same
+    segments, so neither the split times nor the voiced lines are redone.
+    """
+    STEPS = {
+        "audio": ["skit", "splits", "render"],
+        "skit": ["skit", "tts", "render"],
+        "article": ["skit", "tts", "render"],
+    }
+    ACTIVE = ("queued", "running")
+    # what the legacy engine leaves next to render.mp4; dropped once the render is stored
+    RENDER_SCRATCH = ("seg_*.mp4", ".seg_*.part.mp4", "segment_*.wav", "main.mp4", "concat.txt")
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.id = self.root.name
+        self._lock = threading.Lock()
+        self._saved = 0.0
+        self.params = self.read_json("params.json") or {}
+        self.state = self.read_json("state.json") or {
+            "status": "new", "steps_done": [], "progress": 0.0, "message": "", "created": time.time()
+        }
+
+    @property
+    def active(self):
+        return self.state["status"] in self.ACTIVE
+
+    def path(self, name):
+        return self.root / name
+
+    def read_json(self, name):
+        try:
+            with open(self.path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_json(self, name, data):
+        part = self.path(f".{name}.part")
+        with open(part, "w") as f:
+            json.dump(data, f)
+        os.replace(part, self.path(name))
+
+    def update(self, **changes):
+        """Change the job state; progress-only updates hit the disk at most once a second."""
+        with self._lock:
+            self.state.update(changes, updated=time.time())
+            if set(changes) - {"progress", "message"} or time.time() - self._saved >= 1.0:
+                self.write_json("state.json", self.state)
+                self._saved = time.time()
+
+    def progress_cb(self, lo, hi):
+        return lambda p, msg: self.update(progress=lo + (hi - lo) * p, message=msg)
+
+    @property
+    def output_key(self):
+        return f"{self.id}-preview" if self.params.get("preview") else self.id
+
+    def output_keys(self, preview=None):
+        """Output store key of each format the job renders; the first format's is output_key."""
+        base = self.output_key if preview is None else f"{self.id}-preview" if preview else self.id
+        formats = self.params.get("formats") or ["landscape"]
+        return {name: base if i == 0 else f"{base}-{name}" for i, name in enumerate(formats)}
+
+    def done(self, step):
+        return step in self.state["steps_done"]
+
+    def checkpoint(self, step):
+        self.update(steps_done=self.state["steps_done"] + [step])
+
+
+def job_lines(job, api_key):
+    """Skit step. Article jobs yield lines while the skit streams in, so TTS can start early."""
+    if job.done("skit"):
+        yield from (tuple(line) for line in job.read_json("skit.json"))
+        return
+    p = job.params
+    if p["mode"] == "article":
+        job.update(message="🧠 Writing skit...")
+        lines = []
+        with span("skit"):
+            for line in stream_skit_lines(p["article"], api_key):
+                lines.append(line)
+                # the lines so far, for the job panel while the rest streams in
+                job.write_json("skit.partial.json", lines)
+                job.update(progress=min(0.2, 0.04 * len(lines)), message=f"🧠 Writing skit... line {len(lines)}")
+                yield line
+    else:
+        lines = parse_skit(p["skit"])
+        yield from lines
+    if not lines:
+        raise Exception("Could not parse skit")
+    job.write_json("skit.json", lines)
+    job.path("skit.partial.json").unlink(missing_ok=True)
+    job.checkpoint("skit")
+
+
+def job_audio(job):
+    """The job's continuous track on disk: the Audio Mode upload or the voiced dialogue.
+
+    None for jobs whose segments.json still points at per-line files.
+    """
+    if job.params["mode"] == "audio":
+        return str(job.path(job.params["audio"]))
+    path = job.path("dialogue.wav")
+    return str(path) if path.exists() else None
+
+
+def job_segments(job, api_key):
+    """TTS step (or speaker timeline for Audio Mode); returns (segments, audio track).
+
+    A freshly voiced dialogue track is returned in memory, to be piped to the
+    render; dialogue.wav keeps it for a resume or a publish.
+    """
+    if job.done("tts") or job.done("splits"):
+        return job.read_json("segments.json"), job_audio(job)
+    p = job.params
+    if p["mode"] == "audio":
+        lines = list(job_lines(job, api_key))
+        audio_path = str(job.path(p["audio"]))
+        if p["split_method"] == "manual" and p["manual_timestamps"]:
+            total_duration = get_duration(audio_path)
+            split_times = [float(t.strip()) for t in p["manual_timestamps"].split(",") if t.strip()]
+            if split_times and split_times[0] == 0:
+                split_times = split_times[1:]
+        else:
+            job.update(progress=0.1, message="🔍 Detecting speaker changes...")
+            with span("splits"):
+                split_times, total_duration = analyze_audio_for_splits(audio_path, len(lines))
+        if len(split_times) != len(lines) - 1:
+            raise Exception(f"{len(lines)} lines need {len(lines) - 1} split times, got {len(split_times)}"
+                            + ("" if p["split_method"] == "manual" else " (is the audio long enough?)"))
+        job.update(splits=split_times)
+        
+        # One continuous track: segments only carry the speaker timeline
+        times = [0] + split_times + [total_duration]
+        segments = []
+        for i, (spk, txt) in enumerate(lines):
+            segments.append({
+                "speaker": spk,
+                "text": txt,
+                "duration": max(0.1, times[i + 1] - times[i])
+            })
+        step = "splits"
+    else:
+        synthesize = synthesize_dialogue if p["batch_tts"] else synthesize_lines
+        lo = 0.2 if p["mode"] == "article" else 0.0
+        with span("tts"):
+            segments = synthesize(job_lines(job, api_key), p["voice1"], p["voice2"], api_key,
+                                  job.progress_cb(lo, lo + 0.4 if lo else 0.5))
+        track, segments = dialogue_track(segments)
+        part = job.path(".dialogue.wav.part")
+        write_wav(str(part), track)
+        os.replace(part, job.path("dialogue.wav"))
+        step = "tts"
+    job.write_json("segments.json", segments)
+    job.checkpoint(step)
+    return segments, track if step == "tts" else job_audio(job)
+
+
+def run_job(job, api_key):
+    """Run (or resume) a job's remaining steps in the calling thread.
+
+    Each run leaves its timings in trace.json (Chrome trace format).
+    """
+    job.update(status="running", error=None, traceback=None)
+    with tracing(job.id) as trace:
+        try:
+            segments, audio = job_segments(job, api_key)
+            preview = job.params.get("preview", False)
+            step = "preview" if preview else "render"
+            if not job.done(step):
+                lo = {"audio": 0.2, "skit": 0.5, "article": 0.6}[job.params["mode"]]
+                job.update(progress=lo, message="🎬 Preparing templates...")
+                store = get_template_store()
+                part = str(job.path("render.mp4"))
+                # another job's cache writes must not evict what this render is about to read
+                with store.pinned(*job.params["templates"]):
+                    with span("templates"):
+                        templates = [
+                            store.build(key, name, lambda f, name=name: job.update(message=f"🎬 Preparing template {name}... {f:.0%}"))
+                            for key, name in zip(job.params["templates"], job.params["template_names"])
+                        ]
+                    # vertical/square are fit from the uploads, not from the 16:9 templates
+                    reframe = (job.params.get("formats") or ["landscape"]) != ["landscape"]
+                    if reframe:
+                        templates = [store.source(key) for key in job.params["templates"]]
+                    with span(step):
+                        paths = create_video_from_segments(
+                            segments, *templates, part, job.progress_cb(lo, 1.0),
+                            engine=job.params["engine"], normalized=not reframe, workers=job.params["workers"], audio=audio,
+                            preview=preview, captions=job.params.get("captions", "off"), formats=job.params.get("formats")
+                        )
+                outputs = get_output_store()
+                for name, key in job.output_keys().items():
+                    outputs.commit(paths[name], key, name=f"{job.params['mode']} {OUTPUT_FORMATS[name]['label']}")
+                job.checkpoint(step)
+                for pattern in RenderJob.RENDER_SCRATCH:
+                    for scratch in job.root.glob(pattern):
+                        scratch.unlink(missing_ok=True)
+                if not preview:
+                    for key in job.output_keys(preview=True).values():
+                        outputs.purge(key)
+                    shutil.rmtree(job.path("inputs"), ignore_errors=True)
+                    job.path("dialogue.wav").unlink(missing_ok=True)
+            job.update(status="done", progress=1.0, message="👀 Preview ready!" if preview else "✨ Video created!")
+        except Exception as e:
+            job.update(status="failed", error=str(e), traceback=traceback.format_exc())
+        finally:
+            trace.save(job.path("trace.json"))
+
+
+class JobManager:
+    """Runs RenderJobs on a small background pool, independent of any browser session."""
+
+    def __init__(self, root, workers=JOB_WORKERS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        cutoff = time.time() - JOB_RETENTION_HOURS * 3600
+        for path in self.root.iterdir():
+            job = RenderJob(path)
+            if job.state.get("updated", job.state["created"]) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+            elif job.active:
+                # left running by a process that is gone; resumable from its checkpoints
+                job.update(status="failed", error="Interrupted by an app restart")
+
+    def create(self, params, inputs):
+        """Make a job folder; inputs maps file names under the job to bytes or buffers."""
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        root = self.root / job_id
+        (root / "inputs").mkdir(parents=True)
+        for name, data in inputs.items():
+            with open(root / name, "wb") as f:
+                f.write(data)
+        job = RenderJob(root)
+        job.write_json("params.json", params)
+        job.params = params
+        job.update(status="new")
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id, owner):
+        """The job, or None when it doesn't exist (any more) or belongs to another session."""
+        with self._lock:
+            if job_id not in self._jobs:
+                root = self.root / Path(job_id).name
+                if not (root / "params.json").exists():
+                    return None
+                self._jobs[job_id] = RenderJob(root)
+            job = self._jobs[job_id]
+        return job if job.params.get("owner") == owner else None
+
+    def submit(self, job, api_key):
+        """Queue a new job, or resume a failed one from its last checkpoint."""
+        if job.active:
+            return
+        job.update(status="queued", message="⏳ Waiting for a free render slot...")
+        self.pool.submit(run_job, job, api_key)
+
+    def publish(self, job, api_key):
+        """Turn a finished preview into a full-quality render of the same segments."""
+        job.params = {**job.params, "preview": False}
+        job.write_json("params.json", job.params)
+        self.submit(job, api_key)
+
+    def recent(self, owner, limit=5):
+        ids = sorted((p.name for p in self.root.iterdir() if (p / "params.json").exists()), reverse=True)
+        return list(itertools.islice(filter(None, (self.get(i, owner) for i in ids)), limit))
+
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager(JOBS_DIR)
 
 # ============================================================================
 # MAIN APP
 # ============================================================================
+def job_skit(job):
+    """Show an article job's generated skit, or the lines streamed in so far."""
+    if job.params["mode"] != "article":
+        return
+    skit = job.read_json("skit.json") or job.read_json("skit.partial.json")
+    if skit:
+        with st.expander("📜 Generated Skit", expanded=not job.done("skit")):
+            st.text("\n".join(f'{spk}: "{txt}"' for spk, txt in skit))
+
+def session_owner():
+    """Hash of this browser session's job owner token; jobs are only visible to their owner.
+
+    The token itself is kept in the URL (?owner=) next to ?job=, so a reload
+    or reconnect in the same tab is still the same owner.
+    """
+    token = st.session_state.get("owner_token") or st.query_params.get("owner", "")
+    if not re.fullmatch(r"[\w-]{22,64}", token):
+        token = secrets.token_urlsafe(16)
+    st.session_state.owner_token = token
+    st.query_params["owner"] = token
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id, owner):
+    """Poll a running job without rerunning the whole page."""
+    job = get_job_manager().get(job_id, owner)
+    if not job:
+        # pruned while this page was polling it
+        st.rerun()
+    job_skit(job)
+    st.progress(min(1.0, job.state["progress"]))
+    st.info(job.state["message"] or "⏳ Starting...")
+    if not job.active:
+        st.rerun()
+
+def job_panel(api_key, owner):
+    """Progress, result or resume controls for the job this session is attached to.
+
+    The job ID also lives in the URL, so a reconnect or a fresh tab reattaches.
+    """
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = get_job_manager().get(job_id, owner) if job_id else None
+    if not job:
+        if job_id:
+            st.session_state.pop("job_id", None)
+            st.query_params.pop("job", None)
+            st.warning("That render doesn't exist any more or belongs to another session")
+        return
+    st.session_state.job_id = job.id
+    
+    st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
+    if job.state.get("splits") is not None:
+        st.info(f"📍 Splits: 0, {', '.join([f'{t:.2f}' for t in job.state['splits']])}")
+    
+    if job.active:
+        job_progress(job.id, owner)
+        return
+    job_skit(job)
+    
+    if job.state["status"] == "done":
+        preview = job.params.get("preview", False)
+        if get_output_store().get(job.output_key):
+            st.success("👀 Preview ready — check the timing, then publish" if preview else "✨ Video created!")
+            media = get_media_server()
+            keys = job.output_keys()
+            tabs = st.tabs([OUTPUT_FORMATS[name]["label"] for name in keys]) if len(keys) > 1 else [st.container()]
+            for tab, key in zip(tabs, keys.values()):
+                with tab:
+                    if media:
+                        st.video(media.url_for(key))
+                        if not preview:
+                            st.link_button("📥 Download Video", media.url_for(key, download=True), use_container_width=True)
+                        continue
+                    # no public media URL (e.g. Community Cloud): play it from Streamlit's static route
+                    # and read it for the download only when the button is clicked
+                    path = get_output_store().get(key)
+                    if not path:
+                        st.warning("This video has expired from the output store")
+                        continue
+                    static = get_static_media()
+                    url = static.url_for(get_output_store(), key) if static else None
+                    if url:
+                        st.video(url)
+                    else:
+                        st.caption("🎞️ Too big to play here — download it to watch")
+                    if not preview:
+                        st.download_button("📥 Download Video", Path(path).read_bytes, f"{key}.mp4", "video/mp4",
+                                           on_click="ignore", use_container_width=True)
+            if preview:
+                if st.button("🚀 Publish full quality", use_container_width=True):
+                    get_job_manager().publish(job, api_key)
+                    st.rerun()
+        else:
+            st.warning("This video has expired from the output store")
+    else:
+        st.error(f"Error: {job.state.get('error')}")
+        if job.state.get("traceback"):
+            with st.expander("Details"):
+                st.code(job.state["traceback"])
+        done = ", ".join(job.state["steps_done"]) or "nothing yet"
+        if st.button(f"🔁 Resume (done: {done})", use_container_width=True):
+            if job.params["mode"] != "audio" and not api_key:
+                st.error("Please add your Gemini API key")
+            else:
+                get_job_manager().submit(job, api_key)
+                st.rerun()
+    
+    trace = job.read_json("trace.json")
+    if trace:
+        with st.expander("⏱️ Timings"):
+            for name, t in trace["otherData"]["stages"].items():
+                st.caption(f"{name} · {t['wall_s']:.1f}s · {t['procs']} processes · {t['cpu_s']:.1f}s CPU · {t['peak_rss_mb']:.0f} MB peak")
+            st.download_button("⬇️ Trace for chrome://tracing", json.dumps(trace), f"{job.id}.trace.json",
+                               "application/json", use_container_width=True)
+    
+    if st.button("✖️ Dismiss", use_container_width=True):
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+        st.rerun()
+
 def main():
+    st.set_page_config(page_title="Pawdcast", page_icon="🎙️", layout="wide", initial_sidebar_state="expanded")
+    st.markdown(page_css(), unsafe_allow_html=True)
+    owner = session_owner()
+    
     # Header
     st.markdown(f'''
     <div class="header-container">
@@ -490,7 +2512,7 @@ def main():
         api_key = st.text_input(
             "Gemini API Key",
             type="password",
-            value=st.secrets.get("GEMINI_API_KEY", "") if hasattr(st, 'secrets') and "GEMINI_API_KEY" in st.secrets else "",
+            value=default_api_key(),
             label_visibility="collapsed",
             placeholder="Enter your Gemini API key"
         )
@@ -498,6 +2520,11 @@ def main():
         st.markdown('<div class="section-header">🎙️ Voices</div>', unsafe_allow_html=True)
         voice1 = st.selectbox("Speaker 1", list(GEMINI_VOICES.keys()), index=0, label_visibility="collapsed")
         voice2 = st.selectbox("Speaker 2", list(GEMINI_VOICES.keys()), index=1, label_visibility="collapsed")
+        batch_tts = st.toggle(
+            "One request per skit", value=False,
+            help="Voice the whole dialogue with a single multi-speaker request. "
+                 "Falls back to one request per line if the audio can't be split cleanly."
+        )
         
         st.markdown('<div class="section-header">🎬 Templates</div>', unsafe_allow_html=True)
         tmpl1 = st.file_uploader("Speaker 1 video", type=["mp4"], key="t1", label_visibility="collapsed")
@@ -510,6 +2537,104 @@ def main():
             st.markdown('<span class="badge-ready">✓ Ready</span>', unsafe_allow_html=True)
         else:
             st.markdown('<span class="badge-waiting">⏳ Upload 3 videos</span>', unsafe_allow_html=True)
+        
+        st.markdown('<div class="section-header">⚙️ Render</div>', unsafe_allow_html=True)
+        engine = st.selectbox(
+            "Render engine",
+            list(RENDER_ENGINES.keys()),
+            index=list(RENDER_ENGINES.keys()).index(RENDER_ENGINE),
+            format_func=lambda x: {
+                "single_pass": "⚡ Single pass",
+                "stream_copy": "🔁 Stream copy",
+                "incremental": "♻️ Incremental",
+                "legacy": "🐢 Legacy (per line)"
+            }[x],
+            label_visibility="collapsed"
+        )
+        captions = st.selectbox(
+            "Captions",
+            CAPTION_MODES,
+            index=CAPTION_MODES.index("burn"),
+            format_func=lambda x: {
+                "off": "🚫 No captions",
+                "burn": "🔤 Burned-in captions",
+                "soft": "💬 Subtitle track",
+                "both": "🔤 Burned in + subtitle track"
+            }[x],
+            help="The copy-based engines can't burn captions in and add a subtitle track instead",
+            label_visibility="collapsed"
+        )
+        formats = st.multiselect(
+            "Formats",
+            list(OUTPUT_FORMATS),
+            default=["landscape"],
+            format_func=lambda x: f"{OUTPUT_FORMATS[x]['label']} {x}",
+            help="Every format comes out of one render; more than 16:9 always renders in a single pass",
+            label_visibility="collapsed",
+            placeholder="16:9 landscape"
+        )
+        workers = st.number_input("Parallel jobs", min_value=1, max_value=4 * (os.cpu_count() or 1), value=RENDER_WORKERS,
+                                  help="ffmpeg processes the per-line engines run at once")
+        preview = st.toggle(
+            "Preview first", value=False,
+            help="Render a quick low-res draft to check speaker switching and timing. "
+                 "Publishing it reuses the voiced lines and split times."
+        )
+        
+        with st.expander("🗄️ Template cache"):
+            store = get_template_store()
+            entries = store.entries()
+            for e in entries:
+                st.caption(f"{e['name'] or e['key'][:8]} · {e['bytes'] / 1e6:.1f} MB · {time.strftime('%b %d %H:%M', time.localtime(e['last_used']))}")
+            if not entries:
+                st.caption("Empty")
+            elif st.button("🗑️ Purge cache", use_container_width=True):
+                store.purge()
+                st.rerun()
+        
+        with st.expander("🗣️ Voice cache"):
+            tts_cache = get_tts_cache()
+            # runs on every rerun, collapsed or not: thousands of lines, so no per-entry metadata reads
+            count, size = tts_cache.usage()
+            st.caption(f"{count} lines · {size / 1e6:.1f} MB · "
+                       f"{tts_cache.hits} hits / {tts_cache.misses} misses")
+            if count and st.button("🗑️ Purge voice cache", use_container_width=True):
+                tts_cache.purge()
+                st.rerun()
+        
+        with st.expander("📡 Gemini latency"):
+            api = get_gemini_clients().stats()
+            st.caption(f"{api['requests']} requests over {api['connections']} connections")
+            for model, phases in api["models"].items():
+                wait, total = phases["wait"], phases["total"]
+                st.caption(f"{model} · wait p50 ≤{wait['p50_s']}s p95 ≤{wait['p95_s']}s · "
+                           f"total mean {total['mean_s']}s"
+                           + (f" · connect mean {phases['connect']['mean_s']}s" if "connect" in phases else ""))
+        
+        with st.expander("📋 Recent renders"):
+            recent = get_job_manager().recent(owner)
+            for job in recent:
+                icon = {"done": "✅", "failed": "⚠️"}.get(job.state["status"], "⏳")
+                if st.button(f"{icon} {job.params['mode']} · {job.id}", key=f"job-{job.id}", use_container_width=True):
+                    st.session_state.job_id = job.id
+                    st.query_params["job"] = job.id
+            if not recent:
+                st.caption("None yet")
+    
+    def start_job(params, inputs):
+        """Hand a render to the background job runner and attach this session to it."""
+        uploads = (tmpl1, tmpl2, tmpl_c)
+        manager = get_job_manager()
+        job = manager.create({
+            **params, "owner": owner, "voice1": voice1, "voice2": voice2, "batch_tts": batch_tts,
+            "engine": engine, "workers": int(workers), "preview": preview, "captions": captions,
+            "formats": formats or ["landscape"],
+            "templates": [stage_upload(u.file_id, u.size, u) for u in uploads],
+            "template_names": [u.name for u in uploads],
+        }, inputs)
+        manager.submit(job, api_key)
+        st.session_state.job_id = job.id
+        st.query_params["job"] = job.id
     
     # Mode selector
     st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
@@ -552,73 +2677,15 @@ def main():
         if st.button("🚀 Create Video", use_container_width=True):
             if not all([audio_file, skit_text, templates_ready]):
                 st.error("Please upload audio, paste skit, and add all 3 templates")
+            elif not parse_skit(skit_text):
+                st.error("Could not parse skit. Use: Speaker 1: \"text\"")
             else:
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    tmp = Path(tmpdir)
-                    progress = st.progress(0)
-                    status = st.empty()
-                    
-                    try:
-                        lines = parse_skit(skit_text)
-                        if not lines:
-                            st.error("Could not parse skit. Use: Speaker 1: \"text\"")
-                            return
-                        
-                        num_segments = len(lines)
-                        audio_path = str(tmp / "input.wav")
-                        with open(audio_path, "wb") as f:
-                            f.write(audio_file.read())
-                        
-                        total_duration = get_duration(audio_path)
-                        progress.progress(0.1)
-                        
-                        if split_method == "manual" and manual_timestamps:
-                            split_times = [float(t.strip()) for t in manual_timestamps.split(",") if t.strip()]
-                            if split_times and split_times[0] == 0:
-                                split_times = split_times[1:]
-                        else:
-                            status.info("🔍 Detecting speaker changes...")
-                            split_times, _ = analyze_audio_for_splits(audio_path, num_segments)
-                        
-                        st.info(f"📍 Splits: 0, {', '.join([f'{t:.2f}' for t in split_times])}")
-                        progress.progress(0.2)
-                        
-                        split_files = split_audio_file(audio_path, split_times, total_duration, str(tmp))
-                        
-                        segments = []
-                        for i, (spk, txt) in enumerate(lines):
-                            if i < len(split_files):
-                                segments.append({
-                                    "speaker": spk,
-                                    "text": txt,
-                                    "audio": split_files[i]["path"],
-                                    "duration": split_files[i]["duration"]
-                                })
-                        
-                        t1_path = str(tmp / "t1.mp4")
-                        t2_path = str(tmp / "t2.mp4")
-                        tc_path = str(tmp / "tc.mp4")
-                        
-                        with open(t1_path, "wb") as f: f.write(tmpl1.read())
-                        with open(t2_path, "wb") as f: f.write(tmpl2.read())
-                        with open(tc_path, "wb") as f: f.write(tmpl_c.read())
-                        
-                        output = str(tmp / "final.mp4")
-                        create_video_from_segments(
-                            segments, t1_path, t2_path, tc_path, output,
-                            lambda p, m: (progress.progress(p), status.info(m))
-                        )
-                        
-                        st.success("✨ Video created!")
-                        with open(output, "rb") as f:
-                            video_bytes = f.read()
-                        st.video(video_bytes)
-                        st.download_button("📥 Download Video", video_bytes, "pawdcast.mp4", "video/mp4", use_container_width=True)
-                        
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
-                        with st.expander("Details"):
-                            st.code(traceback.format_exc())
+                audio_name = f"inputs/audio{Path(audio_file.name).suffix or '.wav'}"
+                start_job(
+                    {"mode": "audio", "skit": skit_text, "audio": audio_name,
+                     "split_method": split_method, "manual_timestamps": manual_timestamps},
+                    {audio_name: audio_file.getbuffer()}
+                )
     
     # ========================================================================
     # SKIT MODE
@@ -640,60 +2707,10 @@ def main():
                 st.error("Please paste a skit")
             elif not templates_ready:
                 st.error("Please upload all 3 templates")
+            elif not parse_skit(skit_text):
+                st.error("Could not parse skit")
             else:
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    tmp = Path(tmpdir)
-                    progress = st.progress(0)
-                    status = st.empty()
-                    
-                    try:
-                        lines = parse_skit(skit_text)
-                        if not lines:
-                            st.error("Could not parse skit")
-                            return
-                        
-                        status.info(f"🎙️ Generating audio for {len(lines)} lines...")
-                        
-                        segments = []
-                        for i, (spk, txt) in enumerate(lines):
-                            voice = GEMINI_VOICES[voice1] if "1" in spk else GEMINI_VOICES[voice2]
-                            audio_path = str(tmp / f"line_{i}.wav")
-                            
-                            generate_audio_gemini(txt, voice, api_key, audio_path)
-                            duration = get_duration(audio_path)
-                            
-                            segments.append({
-                                "speaker": spk,
-                                "text": txt,
-                                "audio": audio_path,
-                                "duration": duration
-                            })
-                            progress.progress((i + 1) / len(lines) * 0.5)
-                        
-                        t1_path = str(tmp / "t1.mp4")
-                        t2_path = str(tmp / "t2.mp4")
-                        tc_path = str(tmp / "tc.mp4")
-                        
-                        with open(t1_path, "wb") as f: f.write(tmpl1.read())
-                        with open(t2_path, "wb") as f: f.write(tmpl2.read())
-                        with open(tc_path, "wb") as f: f.write(tmpl_c.read())
-                        
-                        output = str(tmp / "final.mp4")
-                        create_video_from_segments(
-                            segments, t1_path, t2_path, tc_path, output,
-                            lambda p, m: (progress.progress(0.5 + p * 0.5), status.info(m))
-                        )
-                        
-                        st.success("✨ Video created!")
-                        with open(output, "rb") as f:
-                            video_bytes = f.read()
-                        st.video(video_bytes)
-                        st.download_button("📥 Download Video", video_bytes, "pawdcast.mp4", "video/mp4", use_container_width=True)
-                        
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
-                        with st.expander("Details"):
-                            st.code(traceback.format_exc())
+                start_job({"mode": "skit", "skit": skit_text}, {})
     
     # ========================================================================
     # ARTICLE MODE
@@ -716,66 +2733,9 @@ def main():
             elif not templates_ready:
                 st.error("Please upload all 3 templates")
             else:
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    tmp = Path(tmpdir)
-                    progress = st.progress(0)
-                    status = st.empty()
-                    
-                    try:
-                        status.info("🧠 Writing skit...")
-                        skit_text = generate_skit(article_text, api_key)
-                        progress.progress(0.2)
-                        
-                        with st.expander("📜 Generated Skit"):
-                            st.text(skit_text)
-                        
-                        lines = parse_skit(skit_text)
-                        if not lines:
-                            st.error("Failed to parse skit")
-                            return
-                        
-                        status.info(f"🎙️ Generating audio...")
-                        segments = []
-                        
-                        for i, (spk, txt) in enumerate(lines):
-                            voice = GEMINI_VOICES[voice1] if "1" in spk else GEMINI_VOICES[voice2]
-                            audio_path = str(tmp / f"line_{i}.wav")
-                            
-                            generate_audio_gemini(txt, voice, api_key, audio_path)
-                            duration = get_duration(audio_path)
-                            
-                            segments.append({
-                                "speaker": spk,
-                                "text": txt,
-                                "audio": audio_path,
-                                "duration": duration
-                            })
-                            progress.progress(0.2 + (i + 1) / len(lines) * 0.4)
-                        
-                        t1_path = str(tmp / "t1.mp4")
-                        t2_path = str(tmp / "t2.mp4")
-                        tc_path = str(tmp / "tc.mp4")
-                        
-                        with open(t1_path, "wb") as f: f.write(tmpl1.read())
-                        with open(t2_path, "wb") as f: f.write(tmpl2.read())
-                        with open(tc_path, "wb") as f: f.write(tmpl_c.read())
-                        
-                        output = str(tmp / "final.mp4")
-                        create_video_from_segments(
-                            segments, t1_path, t2_path, tc_path, output,
-                            lambda p, m: (progress.progress(0.6 + p * 0.4), status.info(m))
-                        )
-                        
-                        st.success("✨ Video created!")
-                        with open(output, "rb") as f:
-                            video_bytes = f.read()
-                        st.video(video_bytes)
-                        st.download_button("📥 Download Video", video_bytes, "pawdcast.mp4", "video/mp4", use_container_width=True)
-                        
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
-                        with st.expander("Details"):
-                            st.code(traceback.format_exc())
+                start_job({"mode": "article", "article": article_text}, {})
+    
+    job_panel(api_key, owner)
     
     # Footer
     st.markdown('''
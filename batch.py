@@ -0,0 +1,225 @@
+"""
+Headless batch rendering — turn a backlog of articles or skits into videos
+without the Streamlit UI.
+
+Jobs come from a directory (every *.skit.txt is a ready-made skit, every other
+*.txt / *.md is an article) or a JSONL manifest, one job per line:
+
+    {"id": "monday", "article": "...", "voice1": "Puck", "voice2": "Kore"}
+    {"id": "tuesday", "skit_file": "skits/tuesday.txt"}
+
+Keys: id, article | article_file | skit | skit_file, and optionally voice1,
+voice2 and output. Relative paths are resolved against the manifest's folder.
+
+    python batch.py articles/ --templates s1.mp4 s2.mp4 outro.mp4 --out videos/ --jobs 3
+    python batch.py manifest.jsonl --templates s1.mp4 s2.mp4 outro.mp4 --results results.jsonl
+
+One JSON line per job (status, timings, output path) is appended to the
+results file as each job finishes.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from streamlit import logger as st_logger
+
+from app import (
+    CAPTION_MODES, GEMINI_VOICES, OUTPUT_FORMATS, RENDER_ENGINE, RENDER_ENGINES, RENDER_WORKERS, TTS_CONCURRENCY,
+    create_video_from_segments, ffprobe_duration, get_gemini_clients, get_template_store, parse_skit,
+    run_parallel, span, stream_skit_lines, synthesize_dialogue, synthesize_lines, tracing,
+)
+
+# st.cache_resource outside `streamlit run` warns about the missing script context on every call
+st_logger.set_log_level("error")
+
+ARTICLE_SUFFIXES = {".txt", ".md"}
+SKIT_SUFFIX = ".skit.txt"
+
+
+def load_jobs(source):
+    """Read jobs from a directory of articles/skits or a JSONL manifest."""
+    source = Path(source)
+    jobs = []
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            if path.name.endswith(SKIT_SUFFIX):
+                jobs.append({"id": path.name[:-len(SKIT_SUFFIX)], "skit": path.read_text()})
+            elif path.suffix in ARTICLE_SUFFIXES:
+                jobs.append({"id": path.stem, "article": path.read_text()})
+        return jobs
+
+    with open(source) as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            for key in ("article", "skit"):
+                if f"{key}_file" in job:
+                    job[key] = (source.parent / job.pop(f"{key}_file")).read_text()
+            if "article" not in job and "skit" not in job:
+                raise Exception(f"{source}:{n}: job needs an article or a skit")
+            job.setdefault("id", f"job{n}")
+            jobs.append(job)
+    return jobs
+
+
+def render_job(job, templates, out_dir, api_key, engine=RENDER_ENGINE, workers=RENDER_WORKERS,
+               voice1="Puck", voice2="Charon", batch_tts=False, tts_concurrency=TTS_CONCURRENCY, captions="burn",
+               trace_dir=None, formats=None, normalized=True):
+    """Render one job to out_dir; returns the job's result record (never raises).
+
+    The record includes per-stage timings; with trace_dir, the full Chrome
+    trace is written there as <id>.trace.json. Extra formats are written
+    next to the output as <id>-<format>.mp4. normalized says whether the
+    templates came out of the template store.
+    """
+    started = time.time()
+    record = {"id": job["id"], "status": "ok", "started_at": round(started, 3)}
+    output = Path(job.get("output") or Path(out_dir) / f"{job['id']}.mp4")
+    synthesize = synthesize_dialogue if batch_tts else synthesize_lines
+    voice1 = job.get("voice1", voice1)
+    voice2 = job.get("voice2", voice2)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir, tracing(job["id"]) as trace:
+            tmp = Path(tmpdir)
+            t = time.perf_counter()
+            if "skit" in job:
+                lines = parse_skit(job["skit"])
+            else:
+                # TTS starts on the first lines while the rest of the skit is still being written
+                lines = stream_skit_lines(job["article"], api_key)
+            with span("tts"):
+                segments = synthesize(lines, voice1, voice2, api_key, concurrency=tts_concurrency)
+            if not segments:
+                raise Exception("Could not parse skit")
+            record["lines"] = len(segments)
+            record["tts_s"] = round(time.perf_counter() - t, 3)
+
+            t = time.perf_counter()
+            final = str(tmp / "final.mp4")
+            with span("render"):
+                paths = create_video_from_segments(segments, *templates, final, engine=engine, normalized=normalized,
+                                                   workers=workers, captions=captions, formats=formats)
+            record["render_s"] = round(time.perf_counter() - t, 3)
+            # the render is new, so hashing it for probe_duration's cache would only cost a full read
+            record["video_s"] = round(ffprobe_duration(final), 3)
+            record["stages"] = trace.stages()
+            if trace_dir:
+                trace.save(Path(trace_dir) / f"{job['id']}.trace.json")
+
+            output.parent.mkdir(parents=True, exist_ok=True)
+            outputs = {}
+            for i, (name, path) in enumerate(paths.items()):
+                target = output if i == 0 else output.with_name(f"{output.stem}-{name}{output.suffix}")
+                part = target.with_name(f".{target.name}.part")
+                shutil.move(path, part)
+                os.replace(part, target)
+                outputs[name] = str(target)
+            record["output"] = str(output)
+            if len(outputs) > 1:
+                record["formats"] = outputs
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["total_s"] = round(time.time() - started, 3)
+    return record
+
+
+def run_batch(jobs, templates, out_dir, api_key, jobs_at_once=1, results_path=None, skip_existing=False,
+              progress_cb=None, **job_kwargs):
+    """Render jobs with jobs_at_once in flight; returns result records in job order.
+
+    templates are (speaker 1, speaker 2, outro) paths; they are normalized once
+    through the template store and shared by every job. With formats other
+    than landscape, every format is fit from the files as given instead.
+    """
+    store = get_template_store()
+    lock = threading.Lock()
+
+    def run(i, job):
+        output = Path(job.get("output") or Path(out_dir) / f"{job['id']}.mp4")
+        if skip_existing and output.exists():
+            record = {"id": job["id"], "status": "skipped", "output": str(output)}
+        else:
+            record = render_job(job, templates, out_dir, api_key, normalized=normalized, **job_kwargs)
+        if results_path:
+            with lock, open(results_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    normalized = (job_kwargs.get("formats") or ["landscape"]) == ["landscape"]
+    # keep the shared templates (and their loops and proxies) cached until the last job is done
+    with contextlib.ExitStack() as pins:
+        if normalized:
+            paths = []
+            for path in templates:
+                paths.append(store.add_file(path))
+                pins.enter_context(store.pinned(Path(paths[-1]).stem))
+            templates = paths
+        return run_parallel(run, jobs, jobs_at_once, progress_cb, label="🎬 Finished job")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of articles/skits, or a JSONL manifest")
+    parser.add_argument("--templates", nargs=3, required=True, metavar=("SPEAKER1", "SPEAKER2", "OUTRO"))
+    parser.add_argument("--out", default="videos", help="output directory (default: videos)")
+    parser.add_argument("--results", default=None, help="results JSONL (default: <out>/results.jsonl)")
+    parser.add_argument("--jobs", type=int, default=1, help="videos rendered at once")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="ffmpeg jobs per video (default: CPU count / --jobs)")
+    parser.add_argument("--tts-concurrency", type=int, default=TTS_CONCURRENCY, help="TTS requests in flight per video")
+    parser.add_argument("--engine", default=RENDER_ENGINE, choices=sorted(RENDER_ENGINES))
+    parser.add_argument("--voice1", default="Puck", choices=list(GEMINI_VOICES))
+    parser.add_argument("--voice2", default="Charon", choices=list(GEMINI_VOICES))
+    parser.add_argument("--captions", default="burn", choices=CAPTION_MODES, help="caption mode (default: burn)")
+    parser.add_argument("--formats", nargs="+", default=["landscape"], choices=list(OUTPUT_FORMATS),
+                        help="output formats from one render; the first is <id>.mp4 (default: landscape)")
+    parser.add_argument("--batch-tts", action="store_true", help="one multi-speaker TTS request per skit")
+    parser.add_argument("--skip-existing", action="store_true", help="leave jobs whose output already exists")
+    parser.add_argument("--trace-dir", help="write a Chrome trace per job here")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"), help="default: $GEMINI_API_KEY")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("no Gemini API key: pass --api-key or set GEMINI_API_KEY")
+    jobs = load_jobs(args.source)
+    if not jobs:
+        parser.error(f"no jobs found in {args.source}")
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    if args.trace_dir:
+        Path(args.trace_dir).mkdir(parents=True, exist_ok=True)
+    results_path = args.results or str(Path(args.out) / "results.jsonl")
+
+    def progress(p, msg):
+        print(f"[{p:4.0%}] {msg}", file=sys.stderr)
+
+    records = run_batch(
+        jobs, args.templates, args.out, args.api_key,
+        jobs_at_once=args.jobs, results_path=results_path, skip_existing=args.skip_existing, progress_cb=progress,
+        engine=args.engine, workers=args.render_workers or max(1, RENDER_WORKERS // args.jobs),
+        voice1=args.voice1, voice2=args.voice2, batch_tts=args.batch_tts, tts_concurrency=args.tts_concurrency,
+        captions=args.captions, trace_dir=args.trace_dir, formats=args.formats,
+    )
+    api = get_gemini_clients().stats()
+    if api["requests"]:
+        print(f"Gemini: {api['requests']} requests over {api['connections']} connections", file=sys.stderr)
+        for model, phases in api["models"].items():
+            print(f"  {model}: " + ", ".join(f"{phase} mean {h['mean_s']}s p95 ≤{h['p95_s']}s" for phase, h in phases.items()),
+                  file=sys.stderr)
+    failed = [r for r in records if r["status"] == "error"]
+    for r in failed:
+        print(f"✗ {r['id']}: {r['error']}", file=sys.stderr)
+    print(f"{len(records) - len(failed)}/{len(records)} jobs done, results in {results_path}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Render engine benchmark — single-pass filtergraph vs the legacy 3-encode path.
+
+Generates synthetic 1080p templates and line audio with ffmpeg lavfi sources,
+then times create_video_from_segments for 6-, 20- and 60-line skits.
+
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --lines 6 20 --engines single_pass --json out.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import create_video_from_segments, run_cmd, RENDER_ENGINES, RENDER_WORKERS  # noqa: E402
+
+
+def make_template(path, color, seconds=5, with_audio=False):
+    cmd = ["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30,hue=h={color}"]
+    if with_audio:
+        cmd += ["-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000"]
+    cmd += ["-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+    cmd += ["-c:a", "aac"] if with_audio else ["-an"]
+    run_cmd(cmd + [path], f"template {path}")
+
+
+def make_line_audio(path, seconds, freq):
+    run_cmd([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency={freq}:sample_rate=24000:duration={seconds}",
+        "-c:a", "pcm_s16le", "-ac", "1", path
+    ], f"line audio {path}")
+
+
+def make_segments(workdir, num_lines):
+    segments = []
+    for i in range(num_lines):
+        # 2.0–5.5 s lines, deterministic so every engine sees the same skit
+        duration = 2.0 + (i * 7 % 8) * 0.5
+        path = str(workdir / f"line_{i}.wav")
+        make_line_audio(path, duration, 200 + 40 * (i % 5))
+        segments.append({
+            "speaker": f"Speaker {i % 2 + 1}",
+            "text": f"line {i}",
+            "audio": path,
+            "duration": duration,
+        })
+    return segments
+
+
+def child_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench(engine, segments, templates, workdir, workers):
+    out_dir = workdir / f"out_{engine}_{len(segments)}"
+    out_dir.mkdir()
+    output = str(out_dir / "final.mp4")
+
+    cpu_start = child_cpu_seconds()
+    wall_start = time.perf_counter()
+    create_video_from_segments(segments, *templates, output, engine=engine, workers=workers)
+    return {
+        "engine": engine,
+        "workers": workers,
+        "lines": len(segments),
+        "wall_s": round(time.perf_counter() - wall_start, 3),
+        "cpu_s": round(child_cpu_seconds() - cpu_start, 3),
+        "output_bytes": os.path.getsize(output),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[6, 20, 60])
+    parser.add_argument("--engines", nargs="+", default=["legacy", "single_pass"], choices=sorted(RENDER_ENGINES))
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="parallel ffmpeg jobs for per-line engines")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        templates = [str(tmp / "t1.mp4"), str(tmp / "t2.mp4"), str(tmp / "tc.mp4")]
+        make_template(templates[0], 0)
+        make_template(templates[1], 120)
+        make_template(templates[2], 240, seconds=3, with_audio=True)
+
+        for num_lines in args.lines:
+            line_dir = tmp / f"lines_{num_lines}"
+            line_dir.mkdir()
+            segments = make_segments(line_dir, num_lines)
+            for engine in args.engines:
+                result = bench(engine, segments, templates, tmp, args.workers)
+                results.append(result)
+                print(f"{engine:>12} {num_lines:>4} lines  {args.workers:>2} workers  wall {result['wall_s']:>8.2f}s  cpu {result['cpu_s']:>8.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Speech boundary detection benchmark — NumPy single-decode detector vs the
+old two-pass ffmpeg silencedetect.
+
+Writes synthetic speech-like WAVs (syllable bursts, short in-line gaps,
+longer pauses between turns) with known turn boundaries, then reports wall
+time, child CPU time and mean boundary error for each detector.
+
+    python benchmarks/bench_splits.py
+    python benchmarks/bench_splits.py --minutes 5 30 60 --turns-per-minute 6
+"""
+import argparse
+import json
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import analyze_audio_for_splits, get_duration  # noqa: E402
+
+SAMPLE_RATE = 24000
+
+
+def legacy_analyze(audio_path, num_segments):
+    """The pre-NumPy detector, kept here as the reference point."""
+    total_duration = get_duration(audio_path)
+    cmd = ["ffmpeg", "-i", audio_path, "-af", "silencedetect=noise=-50dB:d=0.8", "-f", "null", "-"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    ends = [float(m.group(1)) for m in re.finditer(r'silence_end: (\d+\.?\d*)', result.stderr) if float(m.group(1)) > 1.0]
+    if len(ends) < num_segments - 1:
+        cmd = ["ffmpeg", "-i", audio_path, "-af", "silencedetect=noise=-32dB:d=0.38", "-f", "null", "-"]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        ends = [float(m.group(1)) for m in re.finditer(r'silence_end: (\d+\.?\d*)', result.stderr)]
+    if len(ends) >= num_segments - 1:
+        return ends[:num_segments - 1], total_duration
+    step = total_duration / num_segments
+    return [step * i for i in range(1, num_segments)], total_duration
+
+
+def write_speech(path, minutes, turns_per_minute, seed=0):
+    """Write a speech-like mono WAV; returns the true turn boundaries (pause midpoints)."""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    turns = max(2, int(minutes * turns_per_minute))
+    line_len = total / turns
+    boundaries = []
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        for turn in range(turns):
+            pause = rng.uniform(0.5, 1.2) if turn else 0.0
+            n = int(line_len)
+            t = np.arange(n) / SAMPLE_RATE
+            pitch = rng.uniform(110, 240)
+            voice = np.sin(2 * np.pi * pitch * t) + 0.4 * np.sin(2 * np.pi * 2.7 * pitch * t)
+            syllables = 0.35 + 0.65 * np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t + rng.uniform(0, 6)), 0, None)
+            signal = 0.3 * voice * syllables
+            # short in-line word gaps that must not be mistaken for turns
+            for _ in range(int(n / SAMPLE_RATE / 3)):
+                g = int(rng.uniform(0, n - SAMPLE_RATE))
+                signal[g:g + int(rng.uniform(0.05, 0.25) * SAMPLE_RATE)] = 0
+            lead = int(pause * SAMPLE_RATE)
+            signal[:lead] = 0
+            if turn:
+                boundaries.append(turn * line_len / SAMPLE_RATE + pause / 2)
+            signal += rng.normal(0, 0.0005, n)
+            wf.writeframes((np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes())
+    return boundaries
+
+
+def child_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench(name, fn, path, boundaries):
+    cpu_start = child_cpu_seconds() + time.process_time()
+    wall_start = time.perf_counter()
+    splits, _ = fn(str(path), len(boundaries) + 1)
+    wall = time.perf_counter() - wall_start
+    cpu = child_cpu_seconds() + time.process_time() - cpu_start
+    error = float(np.mean(np.abs(np.array(splits) - np.array(boundaries)))) if len(splits) == len(boundaries) else None
+    return {"detector": name, "wall_s": round(wall, 3), "cpu_s": round(cpu, 3),
+            "mean_error_s": None if error is None else round(error, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[30, 60])
+    parser.add_argument("--turns-per-minute", type=float, default=5)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for minutes in args.minutes:
+            path = Path(tmpdir) / f"speech_{minutes:g}min.wav"
+            boundaries = write_speech(path, minutes, args.turns_per_minute)
+            for name, fn in (("silencedetect", legacy_analyze), ("numpy", analyze_audio_for_splits)):
+                result = {"minutes": minutes, "turns": len(boundaries) + 1, **bench(name, fn, path, boundaries)}
+                results.append(result)
+                print(f"{minutes:>5g} min  {name:>13}  wall {result['wall_s']:>7.2f}s  cpu {result['cpu_s']:>7.2f}s  "
+                      f"mean error {result['mean_error_s']}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
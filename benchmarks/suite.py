@@ -0,0 +1,346 @@
+"""
+Offline benchmark suite for the render pipeline.
+
+Builds synthetic 1080p templates, per-line audio and hour-scale speech-like
+tracks with ffmpeg lavfi sources, then measures each pipeline stage in its
+own forked process:
+
+    startup      import app in a fresh interpreter; first run and median
+                 rerun of the page per mode (Streamlit AppTest)
+    templates    normalize + loop the templates (TemplateStore, cold)
+    splits       analyze_audio_for_splits on a continuous track
+    split_files  split_audio_file on the same track (legacy Audio Mode path)
+    render       create_video_from_segments, per engine and skit length
+    longform     Audio Mode render of one long track, per engine and turn
+                 count; also counts ffmpeg spawns. Per-line engines above
+                 LONGFORM_LINES turns run (and are reported) as single_pass
+
+Every case records wall time, CPU time (process + ffmpeg children), peak RSS
+of the Python process and of its largest ffmpeg child, and bytes written.
+Long-form cases should show peak ffmpeg RSS and spawns flat as turns grow.
+Child RSS never reads below the Python process's own size, since Linux
+counts it from the moment of the fork.
+
+    python benchmarks/suite.py --json results.json
+    python benchmarks/suite.py --quick --save-baseline baseline.json
+    python benchmarks/suite.py --quick --baseline baseline.json --threshold 0.15
+    python benchmarks/suite.py --stages startup
+
+With --baseline, any case whose wall time, CPU time or peak RSS grows past
+the threshold is reported and the exit status is 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+# keep the suite's template/TTS caches out of the user's cache dir
+os.environ.setdefault("PAWDCAST_CACHE_DIR", tempfile.mkdtemp(prefix="pawdcast-bench-"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from app import (  # noqa: E402
+    LONGFORM_LINES, PER_LINE_ENGINES, analyze_audio_for_splits, create_video_from_segments, get_template_store,
+    run_cmd, split_audio_file,
+)
+from bench_render import make_segments, make_template  # noqa: E402
+from streamlit import logger as st_logger  # noqa: E402
+
+# AppTest and st.cache_resource outside `streamlit run` warn about the missing script context
+st_logger.set_log_level("error")
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+STAGES = ("startup", "templates", "splits", "render", "longform")
+MODES = ("audio", "skit", "article")
+RERUNS = 5
+FULL = {"lines": [4, 20, 50, 100], "minutes": [1, 10, 60], "engines": ["single_pass", "stream_copy"],
+        "longform_minutes": 60, "turns": [30, 300], "longform_engines": ["single_pass", "stream_copy", "legacy"]}
+QUICK = {"lines": [4, 20], "minutes": [1, 5], "engines": ["single_pass", "stream_copy"],
+         "longform_minutes": 5, "turns": [10, 100], "longform_engines": ["single_pass", "stream_copy", "legacy"]}
+TURN_SECONDS = 12
+PAUSE_SECONDS = 0.8
+METRICS = ("wall_s", "cpu_s", "peak_rss_mb")
+# Cases faster/smaller than this in the baseline are too noisy to flag
+NOISE_FLOOR = {"wall_s": 0.2, "cpu_s": 0.2, "peak_rss_mb": 20}
+
+
+def make_speech(path, minutes):
+    """Speech-like mono track from aevalsrc: a voice per turn, syllable bursts,
+    short word gaps and a PAUSE_SECONDS gap opening every TURN_SECONDS turn.
+    Returns the true turn boundaries (pause midpoints)."""
+    voice = (f"sin(2*PI*(180+80*mod(floor(t/{TURN_SECONDS}),2))*t)"
+             f"*(0.6+0.4*sin(2*PI*4*t))"
+             f"*gt(mod(t*0.37,1),0.06)"
+             f"*gt(mod(t,{TURN_SECONDS}),{PAUSE_SECONDS})")
+    seconds = minutes * 60
+    expr = f"0.3*{voice}+0.0005*random(0)".replace(",", "\\,")
+    run_cmd([
+        "ffmpeg", "-y", "-f", "lavfi", "-i",
+        f"aevalsrc={expr}:s=24000:d={seconds}",
+        "-c:a", "pcm_s16le", "-ac", "1", str(path)
+    ], f"speech {minutes} min")
+    turns = int(seconds // TURN_SECONDS)
+    return [k * TURN_SECONDS + PAUSE_SECONDS / 2 for k in range(1, turns)]
+
+
+def read_io():
+    """Bytes written by this process and its reaped children, from /proc."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["write_bytes"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _measure(conn, fn, args):
+    try:
+        io_start = read_io()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        extra = fn(*args) or {}
+        wall = time.perf_counter() - wall_start
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        io_end = read_io()
+        conn.send({
+            "wall_s": round(wall, 3),
+            "cpu_s": round(time.process_time() - cpu_start + children.ru_utime + children.ru_stime, 3),
+            "peak_rss_mb": round(own.ru_maxrss / 1024, 1),
+            "peak_child_rss_mb": round(children.ru_maxrss / 1024, 1),
+            "disk_write_bytes": io_end[0] - io_start[0],
+            "write_bytes": io_end[1] - io_start[1],
+            **extra,
+        })
+    except Exception as e:
+        conn.send({"error": str(e), "trace": traceback.format_exc()})
+    finally:
+        conn.close()
+
+
+def measure(fn, *args):
+    """Run fn(*args) in a forked process so rusage and RSS belong to this case alone."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_measure, args=(child, fn, args))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def stage_import():
+    """Import app in a fresh interpreter, as `streamlit run` does on a cold start."""
+    probe = ("import sys, time; t = time.perf_counter(); import app; "
+             "print(time.perf_counter() - t, 'google.genai' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", probe], cwd=APP.parent, capture_output=True, text=True, check=True)
+    seconds, genai = out.stdout.split()[-2:]
+    return {"import_s": round(float(seconds), 3), "genai_loaded": genai == "True"}
+
+
+def stage_rerun(mode, reruns):
+    """First run of the page in a mode, then the median of rerunning it unchanged."""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(APP), default_timeout=120)
+    t = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t
+    if mode != MODES[0]:
+        t = time.perf_counter()
+        at.radio[0].set_value(mode).run()
+        first = time.perf_counter() - t
+    times = []
+    for _ in range(reruns):
+        t = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t)
+    if at.exception:
+        raise Exception(at.exception[0].message)
+    return {"first_run_s": round(first, 3), "rerun_s": round(statistics.median(times), 3)}
+
+
+def stage_templates(paths):
+    store = get_template_store()
+    speaker1, speaker2, closing = [store.add_file(p) for p in paths]
+    store.loop(speaker1, 60)
+    store.loop(speaker2, 60)
+
+
+def stage_splits(path, turns):
+    splits, _ = analyze_audio_for_splits(str(path), turns)
+    return {"splits": splits}
+
+
+def stage_split_files(path, splits, total, out_dir):
+    out_dir.mkdir(exist_ok=True)
+    split_audio_file(str(path), splits, total, str(out_dir))
+
+
+def stage_render(segments, templates, output, engine, workers):
+    create_video_from_segments(segments, *templates, str(output), engine=engine, workers=workers)
+    return {"output_bytes": os.path.getsize(output)}
+
+
+class CountingPopen(subprocess.Popen):
+    spawned = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingPopen.spawned += 1
+        super().__init__(*args, **kwargs)
+
+
+def stage_longform(audio, minutes, turns, templates, output, engine, workers):
+    """Audio Mode render of a continuous track split evenly into alternating turns."""
+    subprocess.Popen = CountingPopen  # forked case process only
+    turn = minutes * 60 / turns
+    segments = [{"speaker": f"Speaker {i % 2 + 1}", "text": f"Turn {i + 1}", "duration": turn} for i in range(turns)]
+    create_video_from_segments(segments, *templates, str(output), engine=engine, workers=workers, audio=str(audio))
+    return {"spawns": CountingPopen.spawned, "output_bytes": os.path.getsize(output)}
+
+
+def case_key(r):
+    return (r["stage"], r.get("case"), r.get("engine"), r.get("lines"), r.get("minutes"), r.get("turns"))
+
+
+def compare(results, baseline, threshold):
+    """Return (case, metric, baseline, current) for every regression past threshold."""
+    base = {case_key(r): r for r in baseline if "error" not in r}
+    regressions = []
+    for r in results:
+        b = base.get(case_key(r))
+        if not b or "error" in r:
+            continue
+        for metric in METRICS:
+            if b[metric] >= NOISE_FLOOR[metric] and r[metric] > b[metric] * (1 + threshold):
+                regressions.append((r, metric, b[metric], r[metric]))
+    return regressions
+
+
+def describe(r):
+    parts = [r["stage"]] + [f"{k}={r[k]}" for k in ("case", "engine", "lines", "minutes", "turns") if r.get(k) is not None]
+    return " ".join(parts)
+
+
+def run_suite(sizes, workdir, workers, stages=STAGES):
+    results = []
+    stages = set(stages)
+
+    def record(case, metrics):
+        r = {**case, **metrics}
+        results.append(r)
+        if "error" in r:
+            print(f"{describe(r):<42} ERROR {r['error']}")
+        else:
+            print(f"{describe(r):<42} wall {r['wall_s']:>8.2f}s  cpu {r['cpu_s']:>8.2f}s  "
+                  f"rss {r['peak_rss_mb']:>7.1f}MB  ffmpeg rss {r['peak_child_rss_mb']:>7.1f}MB  "
+                  f"written {r['write_bytes'] / 1e6:>9.1f}MB"
+                  + "".join(f"  {k} {r[k]}" for k in ("import_s", "genai_loaded", "first_run_s", "rerun_s", "spawns") if k in r))
+        return r
+
+    if "startup" in stages:
+        record({"stage": "startup", "case": "import"}, measure(stage_import))
+        for mode in MODES:
+            record({"stage": "startup", "case": mode}, measure(stage_rerun, mode, RERUNS))
+
+    templates = [str(workdir / "t1.mp4"), str(workdir / "t2.mp4"), str(workdir / "tc.mp4")]
+    if stages & {"templates", "render", "longform"}:
+        make_template(templates[0], 0)
+        make_template(templates[1], 120)
+        make_template(templates[2], 240, seconds=3, with_audio=True)
+    if "templates" in stages:
+        record({"stage": "templates"}, measure(stage_templates, templates))
+
+    for minutes in sizes["minutes"] if "splits" in stages else []:
+        path = workdir / f"speech_{minutes}min.wav"
+        boundaries = make_speech(path, minutes)
+        r = record({"stage": "splits", "minutes": minutes},
+                   measure(stage_splits, path, len(boundaries) + 1))
+        splits = r.pop("splits", None)
+        if splits and len(splits) == len(boundaries):
+            r["mean_error_s"] = round(sum(abs(a - b) for a, b in zip(splits, boundaries)) / len(splits), 3)
+        record({"stage": "split_files", "minutes": minutes},
+               measure(stage_split_files, path, boundaries, minutes * 60, workdir / f"split_{minutes}"))
+
+    for num_lines in sizes["lines"] if "render" in stages else []:
+        line_dir = workdir / f"lines_{num_lines}"
+        line_dir.mkdir()
+        segments = make_segments(line_dir, num_lines)
+        for engine in sizes["engines"]:
+            output = workdir / f"render_{engine}_{num_lines}.mp4"
+            record({"stage": "render", "engine": engine, "lines": num_lines, "workers": workers},
+                   measure(stage_render, segments, templates, output, engine, workers))
+            output.unlink(missing_ok=True)
+
+    if "longform" in stages:
+        minutes = sizes["longform_minutes"]
+        path = workdir / f"speech_{minutes}min.wav"
+        if not path.exists():
+            make_speech(path, minutes)
+        for turns in sizes["turns"]:
+            ran = set()
+            for engine in sizes["longform_engines"]:
+                # above LONGFORM_LINES the per-line engines hand over to single_pass:
+                # label the case with the engine that runs, and don't run it twice
+                if engine in PER_LINE_ENGINES and turns > LONGFORM_LINES:
+                    engine = "single_pass"
+                if engine in ran:
+                    continue
+                ran.add(engine)
+                output = workdir / f"longform_{engine}_{turns}.mp4"
+                record({"stage": "longform", "engine": engine, "minutes": minutes, "turns": turns, "workers": workers},
+                       measure(stage_longform, path, minutes, turns, templates, output, engine, workers))
+                output.unlink(missing_ok=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast check")
+    parser.add_argument("--lines", type=int, nargs="+", help="skit lengths to render")
+    parser.add_argument("--minutes", type=float, nargs="+", help="audio lengths for the split stages")
+    parser.add_argument("--engines", nargs="+", help="render engines to run")
+    parser.add_argument("--longform-minutes", type=float, help="track length for the longform stage")
+    parser.add_argument("--turns", type=int, nargs="+", help="turn counts for the longform stage")
+    parser.add_argument("--longform-engines", nargs="+", help="render engines for the longform stage")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="stages to run (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel ffmpeg jobs per render")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--save-baseline", help="write results as the baseline to compare against later")
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed growth before a regression (default 0.10)")
+    args = parser.parse_args()
+
+    sizes = dict(QUICK if args.quick else FULL)
+    for key in ("lines", "minutes", "engines", "longform_minutes", "turns", "longform_engines"):
+        if getattr(args, key):
+            sizes[key] = getattr(args, key)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = run_suite(sizes, Path(tmpdir), args.workers, args.stages)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for r, metric, before, now in regressions:
+            print(f"REGRESSION {describe(r)}: {metric} {before} -> {now} (+{(now / before - 1):.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions past {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# app.py and batch.py are top-level modules, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from app import DiskCache, TemplateStore
+
+
+def add(cache, key, size, age):
+    """Commit a size-byte entry last used age seconds ago."""
+    part = cache.part_path(key)
+    with open(part, "wb") as f:
+        f.write(b"\0" * size)
+    path = cache.commit(part, key)
+    t = 1_000_000 - age
+    os.utime(path, (t, t))
+    return path
+
+
+def keys(cache):
+    return sorted(k for k, _, _ in cache.scan())
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(tmp_path / "cache", 300)
+
+
+def test_evicts_least_recently_used(cache):
+    add(cache, "a", 100, age=30)
+    add(cache, "b", 100, age=20)
+    add(cache, "c", 100, age=10)
+    add(cache, "d", 100, age=0)
+    assert keys(cache) == ["b", "c", "d"]
+    assert not (cache.root / "a.json").exists()
+
+
+def test_get_refreshes_an_entry(cache):
+    add(cache, "a", 100, age=30)
+    add(cache, "b", 100, age=20)
+    add(cache, "c", 100, age=10)
+    assert cache.get("a")
+    add(cache, "d", 100, age=0)
+    assert keys(cache) == ["a", "c", "d"]
+    assert cache.get("b") is None
+
+
+def test_just_committed_entry_is_kept(cache):
+    add(cache, "a", 100, age=0)
+    # older than everything else, but it is the entry being added
+    add(cache, "big", 250, age=100)
+    assert keys(cache) == ["big"]
+
+
+def test_pinned_entries_survive(cache):
+    add(cache, "a", 100, age=30)
+    add(cache, "b", 100, age=20)
+    add(cache, "c", 100, age=10)
+    with cache.pinned("a"):
+        add(cache, "d", 100, age=0)
+        assert keys(cache) == ["a", "c", "d"]
+    add(cache, "e", 100, age=0)
+    assert "a" not in keys(cache)
+
+
+def test_usage_and_purge(cache):
+    add(cache, "a", 100, age=1)
+    add(cache, "b", 50, age=0)
+    assert cache.usage() == (2, 150)
+    assert cache.purge("a") == 1
+    assert cache.purge() == 1
+    assert cache.usage() == (0, 0)
+
+
+@pytest.fixture
+def templates(tmp_path):
+    return TemplateStore(tmp_path / "templates", 350)
+
+
+def test_template_family_is_evicted_together(templates):
+    add(templates, "t1", 100, age=40)
+    add(templates, "t2", 100, age=30)
+    add(templates, "t1-loop", 100, age=0)
+    # t1 is the oldest; its loop goes with it even though it was just used
+    add(templates, "t3", 100, age=0)
+    assert keys(templates) == ["t2", "t3"]
+
+
+def test_pinned_template_keeps_its_family(templates):
+    add(templates, "t1", 100, age=40)
+    add(templates, "t1-loop", 100, age=30)
+    add(templates, "t2", 100, age=20)
+    with templates.pinned("t1"):
+        add(templates, "t3", 100, age=0)
+        assert keys(templates) == ["t1", "t1-loop", "t3"]
+
+
+def test_template_purge_removes_derived_entries(templates):
+    add(templates, "t1", 100, age=2)
+    add(templates, "t1-preview", 100, age=1)
+    add(templates, "t10", 100, age=0)
+    templates.purge("t1")
+    assert keys(templates) == ["t10"]
@@ -0,0 +1,80 @@
+import http.client
+
+import pytest
+
+from app import MediaServer, OutputStore
+
+VIDEO = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    store = OutputStore(tmp_path_factory.mktemp("outputs"), 10 ** 6, 3600)
+    part = store.part_path("job1")
+    part.write_bytes(VIDEO)
+    store.commit(part, "job1")
+    media = MediaServer(store, host="127.0.0.1", port=0, base_url=None)
+    yield media.httpd.server_address[1]
+    media.httpd.shutdown()
+
+
+def fetch(port, path, range_header=None, method="GET"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request(method, path, headers={"Range": range_header} if range_header else {})
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp, body
+
+
+def test_whole_file(server):
+    resp, body = fetch(server, "/job1.mp4")
+    assert resp.status == 200
+    assert resp.getheader("Content-Type") == "video/mp4"
+    assert resp.getheader("Accept-Ranges") == "bytes"
+    assert body == VIDEO
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=100-", 100, len(VIDEO) - 1),
+    ("bytes=-500", len(VIDEO) - 500, len(VIDEO) - 1),
+    ("bytes=10000-99999", 10000, len(VIDEO) - 1),
+    ("bytes=-99999", 0, len(VIDEO) - 1),
+])
+def test_ranges(server, header, start, end):
+    resp, body = fetch(server, "/job1.mp4", header)
+    assert resp.status == 206
+    assert resp.getheader("Content-Range") == f"bytes {start}-{end}/{len(VIDEO)}"
+    assert body == VIDEO[start:end + 1]
+
+
+def test_unsatisfiable_range(server):
+    resp, _ = fetch(server, "/job1.mp4", f"bytes={len(VIDEO)}-")
+    assert resp.status == 416
+    assert resp.getheader("Content-Range") == f"bytes */{len(VIDEO)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=-", "items=0-10", "bytes=abc"])
+def test_malformed_range_sends_whole_file(server, header):
+    resp, body = fetch(server, "/job1.mp4", header)
+    assert resp.status == 200
+    assert body == VIDEO
+
+
+def test_head_has_no_body(server):
+    resp, body = fetch(server, "/job1.mp4", "bytes=0-9", method="HEAD")
+    assert resp.status == 206
+    assert resp.getheader("Content-Length") == "10"
+    assert body == b""
+
+
+def test_download_flag(server):
+    resp, _ = fetch(server, "/job1.mp4?download=1")
+    assert "attachment" in resp.getheader("Content-Disposition")
+
+
+@pytest.mark.parametrize("path", ["/missing.mp4", "/job1.json", "/.job1.part.mp4", "/job1.mp4.bak"])
+def test_unknown_files_404(server, path):
+    resp, _ = fetch(server, path)
+    assert resp.status == 404
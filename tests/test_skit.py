@@ -0,0 +1,46 @@
+import pytest
+
+from app import SkitStreamParser, parse_skit
+
+SKITS = [
+    'Speaker 1: "Hello there!"\nSpeaker 2: "Hi, how are you?"\n',
+    "Speaker 1: unquoted line\nSpeaker 2: another one\nSpeaker 1: last",
+    '**Speaker 1:** "Bold header"\n**Speaker 2:** "Colons: fine, commas too"',
+    'Intro text.\nSpeaker 1: "He said \'hi\'"Speaker 2: run-on without newline',
+    'Speaker 1: ""\nSpeaker 2: "kept"\nSpeaker 1:',
+]
+
+
+def streamed(text, size):
+    parser = SkitStreamParser()
+    lines = []
+    for i in range(0, len(text), size):
+        lines += parser.feed(text[i:i + size])
+    return lines + parser.close()
+
+
+def test_parse_skit_lines():
+    assert parse_skit(SKITS[0]) == [("Speaker 1", "Hello there!"), ("Speaker 2", "Hi, how are you?")]
+    assert parse_skit(SKITS[1]) == [("Speaker 1", "unquoted line"), ("Speaker 2", "another one"), ("Speaker 1", "last")]
+    assert parse_skit(SKITS[2]) == [("Speaker 1", "Bold header"), ("Speaker 2", "Colons: fine, commas too")]
+
+
+def test_parse_skit_skips_empty_lines():
+    assert parse_skit(SKITS[4]) == [("Speaker 2", "kept")]
+    assert parse_skit("") == []
+    assert parse_skit("no speakers here") == []
+
+
+@pytest.mark.parametrize("text", SKITS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 1000])
+def test_stream_matches_whole_text(text, size):
+    assert streamed(text, size) == parse_skit(text)
+
+
+def test_quoted_line_is_finished_at_closing_quote():
+    parser = SkitStreamParser()
+    assert parser.feed('Speaker 1: "done"') == [("Speaker 1", "done")]
+    # an unquoted line may still grow until the next header
+    assert parser.feed(" Speaker 2: still typing") == []
+    assert parser.feed(" Speaker 1:") == [("Speaker 2", "still typing")]
+    assert parser.close() == []
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from app import RENDER_FPS, SPLIT_FRAME_SECONDS, caption_events, find_speech_boundaries, segment_frames
+
+
+def segs(*durations, text="word"):
+    return [{"duration": d, "text": text} for d in durations]
+
+
+def test_segment_frames_cumulative_tracks_the_timeline():
+    frames = segment_frames(segs(0.51, 0.51, 0.51))
+    assert frames == [15, 16, 15]
+    assert sum(frames) == round(3 * 0.51 * RENDER_FPS)
+
+
+def test_segment_frames_independent_rounds_each_segment():
+    assert segment_frames(segs(0.51, 0.51, 0.51), cumulative=False) == [15, 15, 15]
+
+
+def test_segment_frames_never_zero():
+    assert segment_frames(segs(0.001, 1.0)) == [1, 30]
+    assert segment_frames(segs(0.001), cumulative=False) == [1]
+
+
+def test_caption_events_share_line_time_by_length():
+    events = caption_events([{"duration": 2.0, "text": "a" * 10 + " " + "b" * 40}, {"duration": 1.0, "text": "hi"}])
+    assert [e[2] for e in events] == ["a" * 10, "b" * 40, "hi"]
+    assert events[0][:2] == (0.0, pytest.approx(0.4))
+    assert events[1][:2] == (pytest.approx(0.4), pytest.approx(2.0))
+    assert events[2][:2] == (pytest.approx(2.0), pytest.approx(3.0))
+
+
+def test_caption_events_skip_silent_lines():
+    events = caption_events([{"duration": 1.0, "text": ""}, {"duration": 1.0, "text": "after"}])
+    assert events == [(1.0, 2.0, "after")]
+
+
+def speech(seconds, pauses=()):
+    """Frame loudness (dB): speech at -20 with -60 dB pauses at (start, end) seconds."""
+    energy = np.full(int(seconds / SPLIT_FRAME_SECONDS), -20.0)
+    energy += np.random.default_rng(0).normal(0, 1, len(energy))
+    for start, end in pauses:
+        energy[int(start / SPLIT_FRAME_SECONDS):int(end / SPLIT_FRAME_SECONDS)] = -60.0
+    return energy
+
+
+def test_boundaries_land_in_pauses():
+    pauses = [(2.0, 2.4), (5.0, 5.4), (7.5, 7.9)]
+    splits = find_speech_boundaries(speech(10, pauses), 4)
+    assert len(splits) == 3
+    for t, (start, end) in zip(splits, pauses):
+        assert start <= t <= end
+
+
+def test_boundaries_prefer_longer_pauses():
+    splits = find_speech_boundaries(speech(10, [(2.0, 2.1), (5.0, 5.6), (8.0, 8.1)]), 2)
+    assert splits == [pytest.approx(5.3, abs=0.05)]
+
+
+def test_boundaries_in_continuous_speech_are_spaced():
+    splits = find_speech_boundaries(speech(20), 4)
+    assert len(splits) == 3
+    gaps = np.diff([0.0] + splits + [20.0])
+    # kept half an average line (2.5 s) from each other and the ends
+    assert gaps.min() >= 2.5
+
+
+def test_clustered_pauses_are_spaced_too():
+    # many short pauses bunched at the start must not all become splits
+    pauses = [(0.5 + 0.2 * i, 0.6 + 0.2 * i) for i in range(6)]
+    splits = find_speech_boundaries(speech(20, pauses), 4)
+    assert len(splits) == 3
+    assert np.diff([0.0] + splits + [20.0]).min() >= 2.5
+
+
+def test_boundaries_are_sorted_and_unique():
+    splits = find_speech_boundaries(speech(3), 20)
+    assert splits == sorted(set(splits))
+
+
+def test_too_few_frames_gives_fewer_splits():
+    assert len(find_speech_boundaries(speech(0.1), 10)) < 9
+    assert find_speech_boundaries(speech(5), 1) == []
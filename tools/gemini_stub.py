@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Gemini API, for trying the app and benchmarks offline.
+
+Answers generateContent / streamGenerateContent with a canned skit for text
+requests and synthetic 24 kHz PCM for TTS requests: a tone per line, with a
+pause between the lines of a multi-speaker request.
+
+    python tools/gemini_stub.py --port 8765
+    GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+--no-pauses makes dialogue audio one continuous tone, so batch TTS can't be
+aligned and falls back to per-line requests; --fail-rate answers that share of
+requests with 429s to exercise the retry path.
+"""
+import argparse
+import base64
+import json
+import random
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+SECONDS_PER_CHAR = 0.06
+PAUSE_SECONDS = 0.6
+
+SKIT = [
+    ("Speaker 1", "Did you read the news this morning?"),
+    ("Speaker 2", "Only the headline, what happened?"),
+    ("Speaker 1", "Someone taught a dog to order pizza online."),
+    ("Speaker 2", "Finally, a dog with better time management than me."),
+    ("Speaker 1", "He tipped in tennis balls."),
+    ("Speaker 2", "Honestly that is a fair rate."),
+]
+
+ROUTE = re.compile(r"^/v1(?:beta|alpha)?/models/(?P<model>[^:]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+def tone(seconds, freq):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return 0.3 * np.sin(2 * np.pi * freq * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE))
+
+
+def synthesize(text, multi_speaker, pauses):
+    """Tone(s) sized by text length; one per 'Speaker N:' line for dialogue requests."""
+    if multi_speaker:
+        lines = re.findall(r"^Speaker\s*(\d+)\s*:\s*(.+)$", text, re.MULTILINE) or [("1", text)]
+    else:
+        lines = [("1", text)]
+    pieces = []
+    for i, (speaker, line) in enumerate(lines):
+        if i and pauses:
+            pieces.append(silence(PAUSE_SECONDS))
+        pieces.append(tone(max(0.5, len(line) * SECONDS_PER_CHAR), 180 if speaker == "1" else 260))
+    pcm = np.concatenate(pieces) + np.random.default_rng(0).normal(0, 0.0005, sum(map(len, pieces)))
+    return (np.clip(pcm, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def audio_response(pcm):
+    return {"candidates": [{
+        "content": {"role": "model", "parts": [{"inlineData": {
+            "mimeType": f"audio/L16;codec=pcm;rate={SAMPLE_RATE}",
+            "data": base64.b64encode(pcm).decode(),
+        }}]},
+        "finishReason": "STOP",
+    }]}
+
+
+def text_response(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive like the real API, so client connection reuse shows up
+    protocol_version = "HTTP/1.1"
+    pauses = True
+    fail_rate = 0.0
+
+    def do_POST(self):
+        # read the body first: on a kept-alive connection, unread bytes would become the next request
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        route = ROUTE.match(self.path)
+        if not route:
+            return self.send_json(404, {"error": {"code": 404, "message": f"no route {self.path}", "status": "NOT_FOUND"}})
+        if random.random() < self.fail_rate:
+            return self.send_json(429, {"error": {"code": 429, "message": "stub rate limit", "status": "RESOURCE_EXHAUSTED"}})
+
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        config = body.get("generationConfig", {})
+
+        if "AUDIO" in config.get("responseModalities", []):
+            speech = config.get("speechConfig", {})
+            multi = "multiSpeakerVoiceConfig" in speech or "multi_speaker_voice_config" in speech
+            return self.send_json(200, audio_response(synthesize(prompt, multi, self.pauses)))
+
+        skit = "\n".join(f'{spk}: "{txt}"' for spk, txt in SKIT)
+        if route.group("method") == "generateContent":
+            return self.send_json(200, text_response(skit))
+
+        # stream in small uneven chunks, the way the real API splits mid-line
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pos = 0
+        while pos < len(skit):
+            step = random.randint(7, 40)
+            self.wfile.write(f"data: {json.dumps(text_response(skit[pos:pos + step]))}\r\n\r\n".encode())
+            self.wfile.flush()
+            pos += step
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-pauses", action="store_true", help="no gaps between dialogue lines")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429")
+    args = parser.parse_args()
+
+    StubHandler.pauses = not args.no_pauses
+    StubHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Gemini stub listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()